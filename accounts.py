@@ -0,0 +1,58 @@
+"""This module holds the student accounts that are synced.
+
+An account is a dict with a name, the schulmanager username and password. Optionally it sets
+the path its schedule.json is written to ("output"), its fantasy-calendar data.json
+("calendar") and the folder of its assignment notes ("export"). By default they are kept in
+accounts/<name>/. Without an account the credentials from .env are used."""
+
+import os
+import json
+import functools
+import threading
+from dotenv import load_dotenv
+
+
+def get_credentials(account=None) -> tuple:
+    """Returns username and password of an account or the ones from the .env file."""
+    if account is not None:
+        return account["username"], account["password"]
+    load_dotenv(".env")
+    return os.getenv("SMUSR"), os.getenv("SMPW")
+
+
+def get_output_path(account=None) -> str:
+    """Returns the path the schedule of an account is written to."""
+    if account is None:
+        return "schedule.json"
+    return account.get(
+        "output", os.path.join("accounts", account["name"], "schedule.json")
+    )
+
+
+class AccountRegistry:
+    """Decorates a function that creates an object for an account, so it's only called once
+    per account and the same object is returned afterwards. None is the account from .env.
+    """
+
+    def __init__(self, create):
+        self.create = create
+        self.objects = {}
+        self.lock = threading.Lock()
+        functools.update_wrapper(self, create)
+
+    def __call__(self, account=None):
+        name = None if account is None else account["name"]
+        with self.lock:
+            if name not in self.objects:
+                self.objects[name] = self.create(account)
+            return self.objects[name]
+
+
+def load_accounts(path="accounts.json") -> list:
+    """Loads the list of accounts from a json file."""
+    with open(path, encoding="utf-8") as f:
+        accounts = json.load(f)
+    for account in accounts:
+        if not all(key in account for key in ("name", "username", "password")):
+            raise ValueError("Every account needs a name, username and password")
+    return accounts
@@ -0,0 +1,140 @@
+"""This module keeps an index of the assignment notes in the export folder.
+
+The subject and a digest of the task of every note with isAssignment: true are stored in a small
+sqlite database together with the mtime and size of the note. A refresh only reads notes that
+are new or changed since the last one, so checking whether an assignment already has a note is a
+set lookup instead of reading the whole folder."""
+
+import os
+import re
+import sqlite3
+import hashlib
+import threading
+from accounts import AccountRegistry, get_output_path
+
+EXPORT_DIR = "C:/Users/Kaenguruu/Desktop/Schule/export/"
+
+
+def task_digest(task) -> str:
+    """Returns the digest of a task, ignoring differences in whitespace."""
+    return hashlib.sha256(" ".join(task.split()).encode("utf-8")).hexdigest()
+
+
+def read_front_matter(content) -> tuple:
+    """Splits a note into the key value pairs of its front matter and the rest of the text."""
+    match = re.match(r"---\r?\n(.*?)\r?\n---\r?\n?", content, re.DOTALL)
+    if match is None:
+        return {}, content
+    fields = {}
+    for line in match.group(1).splitlines():
+        key, sep, value = line.partition(":")
+        if sep:
+            fields[key.strip()] = value.strip().strip("\"'")
+    return fields, content[match.end() :]
+
+
+def read_assignment(path) -> tuple:
+    """Returns subject and task of an assignment note or None for other notes."""
+    # The notes are the ones the Obsidian vault exports for homework: a front matter with
+    # isAssignment: true and subject, the task either under task, under description or as
+    # the body of the note
+    with open(path, encoding="utf-8") as f:
+        fields, body = read_front_matter(f.read())
+    if fields.get("isAssignment") != "true":
+        return None
+    task = fields.get("task") or fields.get("description") or body.strip()
+    return fields.get("subject", ""), task
+
+
+class AssignmentIndex:
+    """The assignment notes of a folder, updated incrementally from their mtimes."""
+
+    def __init__(self, path="assignment_index.db", directory=EXPORT_DIR):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS notes ("
+            "path TEXT PRIMARY KEY, mtime INTEGER, size INTEGER, "
+            "subject TEXT, digest TEXT)"
+        )
+        self.db.execute(
+            "CREATE INDEX IF NOT EXISTS notes_assignment ON notes (subject, digest)"
+        )
+        self.db.commit()
+
+    def refresh(self) -> int:
+        """Reads the notes that changed since the last refresh and forgets deleted ones.
+        Returns the number of notes that were read."""
+        try:
+            entries = [
+                entry
+                for entry in os.scandir(self.directory)
+                if entry.name.endswith(".md") and entry.is_file()
+            ]
+        except FileNotFoundError:
+            entries = []
+
+        with self.lock:
+            known = {
+                path: (mtime, size)
+                for path, mtime, size in self.db.execute(
+                    "SELECT path, mtime, size FROM notes"
+                )
+            }
+            changed = []
+            for entry in entries:
+                stat = entry.stat()
+                signature = (stat.st_mtime_ns, stat.st_size)
+                if known.pop(entry.path, None) == signature:
+                    continue
+                assignment = read_assignment(entry.path)
+                # Other notes are stored as well so they aren't read again
+                subject, digest = (
+                    (None, None)
+                    if assignment is None
+                    else (assignment[0], task_digest(assignment[1]))
+                )
+                changed.append((entry.path, *signature, subject, digest))
+
+            self.db.executemany(
+                "INSERT OR REPLACE INTO notes VALUES (?, ?, ?, ?, ?)", changed
+            )
+            self.db.executemany(
+                "DELETE FROM notes WHERE path = ?", [(path,) for path in known]
+            )
+            self.db.commit()
+        return len(changed)
+
+    def keys(self) -> set:
+        """Returns (subject, task digest) of every assignment note."""
+        with self.lock:
+            return set(
+                self.db.execute(
+                    "SELECT subject, digest FROM notes WHERE digest IS NOT NULL"
+                )
+            )
+
+    def close(self) -> None:
+        """Closes the database."""
+        self.db.close()
+
+
+@AccountRegistry
+def open_assignment_index(account=None) -> AssignmentIndex:
+    """Returns the index of an account. Accounts keep the index and their export folder next
+    to their schedule.json unless they set "export"."""
+    if account is None:
+        return AssignmentIndex()
+    directory = os.path.dirname(get_output_path(account))
+    return AssignmentIndex(
+        os.path.join(directory, "assignment_index.db"),
+        account.get("export", os.path.join(directory, "export")),
+    )
+
+
+def get_assignment_index(account=None) -> AssignmentIndex:
+    """Returns the index of the export folder of an account, refreshed from disk."""
+    index = open_assignment_index(account)
+    index.refresh()
+    return index
@@ -0,0 +1,56 @@
+"""This module holds the bell times of the school, loaded once from bell_schedule.json."""
+
+import json
+from bisect import bisect_right
+
+
+class BellSchedule:
+    """The periods of a school day with constant time lookups from start and end to period."""
+
+    def __init__(self, periods):
+        # periods is a list of [[start hour, start minute], [end hour, end minute]]
+        self.periods = [[list(start), list(end)] for start, end in periods]
+        self.starts = [start[0] * 60 + start[1] for start, _ in self.periods]
+        self.ends = [end[0] * 60 + end[1] for _, end in self.periods]
+        self.slots = {
+            (start, end): i
+            for i, (start, end) in enumerate(zip(self.starts, self.ends))
+        }
+
+    def __len__(self):
+        return len(self.periods)
+
+    def period_of(self, start, end) -> int:
+        """Returns the index of the period from start to end given as [hour, minute]."""
+        try:
+            return self.slots[(start[0] * 60 + start[1], end[0] * 60 + end[1])]
+        except KeyError:
+            raise ValueError(f"{start} - {end} is not a period of the bell schedule")
+
+    def period_at(self, minutes) -> int:
+        """Returns the index of the period running at the given minute of the day or None."""
+        i = bisect_right(self.starts, minutes) - 1
+        if i >= 0 and minutes < self.ends[i]:
+            return i
+        return None
+
+    def start(self, period) -> list:
+        """Returns the start of a period as [hour, minute]."""
+        return list(self.periods[period][0])
+
+    def end(self, period) -> list:
+        """Returns the end of a period as [hour, minute]."""
+        return list(self.periods[period][1])
+
+
+bell_schedule = None
+
+
+def get_bell_schedule(path="bell_schedule.json") -> BellSchedule:
+    """Returns the shared bell schedule, loading it from the config file on first use."""
+    global bell_schedule
+
+    if bell_schedule is None:
+        with open(path, encoding="utf-8") as f:
+            bell_schedule = BellSchedule(json.load(f)["periods"])
+    return bell_schedule
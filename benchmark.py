@@ -0,0 +1,218 @@
+"""This module benchmarks the parsing and lookup hot paths on synthetic pages.
+
+Each stage of the sync (convert, the streaming parsers, load_schedule_from_json,
+clean_up_schedule and load_homework_from_json) and the lesson lookups of the presence daemon
+are timed on pages from synthetic_data.py. The average runtime, throughput and peak memory of
+every stage are printed and saved as json, optionally compared with an earlier run."""
+
+import io
+import os
+import sys
+import json
+import argparse
+import datetime
+import platform
+import tempfile
+import contextlib
+import sync_schulmanager as smsync
+import lesson_parser
+import assignment_index
+import synthetic_data
+from lesson_parser import measure
+from bell_schedule import get_bell_schedule
+from lessons import schedule_from_dict
+from timeline import WeeklyTimeline
+from exceptions_store import ExceptionsStore
+
+
+def stage(function, items, runs) -> dict:
+    """Measures a stage that handles the given number of items per call."""
+    result = measure(function, runs)
+    result["items"] = items
+    result["per_second"] = round(items / result["ms"] * 1000, 1) if result["ms"] else 0
+    return result
+
+
+def day_entries(records, bells) -> list:
+    """Returns the entries of every day as build_schedule hands them to clean_up_schedule."""
+    days = [[] for _ in range(5)]
+    for record in records:
+        if record["subject"] != "":
+            days[record["day"]].append(
+                {
+                    "subject": record["subject"],
+                    "room": record["room"],
+                    "teacher": record["teacher"],
+                    "double": False,
+                    "start": bells.start(record["hour"]),
+                    "end": bells.end(record["hour"]),
+                }
+            )
+    return days
+
+
+def sample_times(step_minutes=5) -> list:
+    """Returns datetimes every few minutes of the school days of the current week."""
+    today = datetime.date.today()
+    monday = datetime.datetime.combine(
+        today - datetime.timedelta(days=today.weekday()), datetime.time(7)
+    )
+    return [
+        monday + datetime.timedelta(days=day, minutes=minute)
+        for day in range(5)
+        for minute in range(0, 10 * 60, step_minutes)
+    ]
+
+
+def setup_calendar(directory) -> None:
+    """Points the assignment export and the fantasy-calendar data to an empty calendar in
+    directory, so load_homework_from_json doesn't touch the real ones."""
+    path = os.path.join(directory, "data.json")
+    categories = [
+        {"name": name, "id": "ID_" + str(i)}
+        for i, name in enumerate(sorted({s for _, s in synthetic_data.SUBJECTS}))
+    ]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"calendars": [{"events": [], "categories": categories}]}, f)
+    os.environ["CALENDAR_PATH"] = path
+    assignment_index.open_assignment_index.objects[None] = (
+        assignment_index.AssignmentIndex(
+            os.path.join(directory, "assignment_index.db"),
+            os.path.join(directory, "export"),
+        )
+    )
+
+
+def run(weeks=4, periods=10, exception_density=0.1, homework=20, runs=10) -> dict:
+    """Generates the pages and measures every stage on them."""
+    pages = synthetic_data.generate(weeks, periods, exception_density, homework)
+    schedules = pages["schedules"]
+    bells = get_bell_schedule()
+    results = {}
+
+    converted = [smsync.convert(html) for html in schedules]
+    results["convert"] = stage(
+        lambda: [smsync.convert(html) for html in schedules + [pages["homework"]]],
+        len(schedules) + 1,
+        runs,
+    )
+    results["parse_schedule"] = stage(
+        lambda: [lesson_parser.parse_schedule(html) for html in schedules],
+        len(schedules),
+        runs,
+    )
+    results["parse_homework"] = stage(
+        lambda: lesson_parser.parse_homework(pages["homework"]), homework, runs
+    )
+
+    schedule_json = [json.dumps(data, ensure_ascii=False) for data in converted]
+    results["load_schedule_from_json"] = stage(
+        lambda: [smsync.load_schedule_from_json(data) for data in schedule_json],
+        len(schedule_json),
+        runs,
+    )
+
+    entries = [
+        day
+        for html in schedules
+        for day in day_entries(lesson_parser.parse_schedule(html), bells)
+    ]
+    results["clean_up_schedule"] = stage(
+        # clean_up_schedule changes the entries, every run needs fresh ones
+        lambda: [
+            smsync.clean_up_schedule([dict(entry) for entry in day], bells)
+            for day in entries
+        ],
+        len(entries),
+        runs,
+    )
+
+    schedule = smsync.load_schedule_from_json(schedule_json[0])
+    homework_json = json.dumps(smsync.convert(pages["homework"]), ensure_ascii=False)
+    with tempfile.TemporaryDirectory() as directory:
+        setup_calendar(directory)
+        with contextlib.redirect_stdout(io.StringIO()):
+            results["load_homework_from_json"] = stage(
+                lambda: smsync.load_homework_from_json(homework_json, schedule),
+                homework,
+                runs,
+            )
+        assignment_index.open_assignment_index.objects.pop(None).close()
+
+    # The lookups of the presence daemon in old/main.py
+    timeline = WeeklyTimeline(schedule_from_dict(schedule))
+    exceptions = ExceptionsStore(schedule["exceptions"], auto_prune=False)
+    times = sample_times()
+    results["current_lesson"] = stage(
+        lambda: timeline.current_lessons(times), len(times), runs
+    )
+    results["next_lesson"] = stage(
+        lambda: timeline.next_lessons(times), len(times), runs
+    )
+    current = [
+        (when.date(), lesson.subject)
+        for when, lesson in zip(times, timeline.current_lessons(times))
+        if lesson is not None
+    ]
+    results["exceptions_for_lesson"] = stage(
+        lambda: [exceptions.for_lesson(day, subject) for day, subject in current],
+        len(current),
+        runs,
+    )
+    return results
+
+
+def compare(previous, results) -> None:
+    """Prints the runtime of every stage next to its change against a previous run."""
+    for name, result in results.items():
+        line = (
+            f"{name}: {result['ms']} ms, {result['per_second']}/s, "
+            f"{result['peak_kb']} KB"
+        )
+        before = previous.get(name)
+        if before and before["ms"]:
+            line += f" ({(result['ms'] / before['ms'] - 1) * 100:+.1f}%)"
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--weeks", type=int, default=4)
+    parser.add_argument("--periods", type=int, default=10)
+    parser.add_argument("--exception-density", type=float, default=0.1)
+    parser.add_argument("--homework", type=int, default=20)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--output", help="where to save the results")
+    parser.add_argument("--compare", help="results of an earlier run")
+    args = parser.parse_args()
+
+    config = {
+        "weeks": args.weeks,
+        "periods": args.periods,
+        "exception_density": args.exception_density,
+        "homework": args.homework,
+        "runs": args.runs,
+    }
+    started = datetime.datetime.now()
+    results = run(**config)
+
+    previous = {}
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            previous = json.load(f)["stages"]
+    compare(previous, results)
+
+    output = args.output or started.strftime("benchmark_%Y%m%d-%H%M%S.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "started": started.isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "platform": sys.platform,
+                "config": config,
+                "stages": results,
+            },
+            f,
+            indent=4,
+        )
+    print("Saved to " + output)
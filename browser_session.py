@@ -0,0 +1,97 @@
+"""This module keeps the login of the browser across restarts.
+
+After a login the cookies and the local storage of the schulmanager website are encrypted
+with a key derived from the account's credentials and stored next to its schedule.json. A new
+browser restores them and only has to fill in the login form if they are no longer valid.
+Without the optional cryptography package no session is stored at all."""
+
+import os
+import json
+import time
+import base64
+import hashlib
+from accounts import get_credentials, get_output_path
+from schedule_store import atomic_write
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:
+    Fernet = None
+
+# A light page on the schulmanager origin. Opening the app itself would start it before
+# the session is restored.
+BLANK_URL = "https://login.schulmanager-online.de/robots.txt"
+
+
+def session_path(account=None) -> str:
+    """Returns the path the encrypted session of an account is stored at."""
+    return os.path.join(os.path.dirname(get_output_path(account)), "session.enc")
+
+
+def get_cipher(account=None):
+    """Returns the cipher for the session of an account or None without cryptography."""
+    if Fernet is None:
+        return None
+    username, password = get_credentials(account)
+    key = hashlib.pbkdf2_hmac(
+        "sha256", password.encode("utf-8"), username.encode("utf-8"), 200_000
+    )
+    return Fernet(base64.urlsafe_b64encode(key))
+
+
+def save_session(driver, account=None) -> None:
+    """Stores the cookies and local storage of the logged in browser."""
+    cipher = get_cipher(account)
+    if cipher is None:
+        return
+    session = {
+        "cookies": driver.get_cookies(),
+        "local_storage": driver.execute_script(
+            "return Object.fromEntries(Object.entries(window.localStorage));"
+        ),
+    }
+    token = cipher.encrypt(json.dumps(session).encode("utf-8"))
+    # Only the owner may read the session, it logs in without a password
+    atomic_write(session_path(account), token.decode("ascii"), mode=0o600)
+
+
+def load_session(account=None) -> dict:
+    """Returns the stored session of an account or None if there is none or it can't be
+    decrypted anymore, e.g. because the password changed."""
+    cipher = get_cipher(account)
+    if cipher is None:
+        return None
+    try:
+        with open(session_path(account), encoding="ascii") as f:
+            return json.loads(cipher.decrypt(f.read().encode("ascii")))
+    except (FileNotFoundError, InvalidToken, ValueError):
+        return None
+
+
+def restore_session(driver, account=None) -> bool:
+    """Puts the stored session into the browser. Returns False if there is nothing to
+    restore. Whether the session is still accepted shows once the next page is open."""
+    session = load_session(account)
+    if session is None:
+        return False
+
+    # Cookies and storage can only be set for the page that is currently open
+    driver.get(BLANK_URL)
+    now = time.time()
+    for cookie in session["cookies"]:
+        if cookie.get("expiry", now + 1) > now:
+            driver.add_cookie(cookie)
+    driver.execute_script(
+        "for (const [key, value] of Object.entries(arguments[0])) {"
+        " window.localStorage.setItem(key, value); }",
+        session["local_storage"],
+    )
+    return True
+
+
+def forget_session(account=None) -> None:
+    """Deletes the stored session of an account."""
+    try:
+        os.remove(session_path(account))
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,73 @@
+"""This module merges assignment events into the data of the fantasy-calendar plugin.
+
+Events get an id derived from their subject and task, so a sync recognizes the events it added
+before and updates them in place instead of appending them again."""
+
+import hashlib
+from assignment_index import task_digest
+
+
+def event_id(subject, task) -> str:
+    """Returns the stable id of the event of an assignment."""
+    content = subject + "\0" + task_digest(task)
+    return "ID_task_" + hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
+
+
+def is_legacy(event) -> bool:
+    """Returns whether the id of an event was built with hash(), like ID_task_-4711."""
+    number = event["id"][len("ID_task_") :]
+    return event["id"].startswith("ID_task_") and number.lstrip("-").isdigit()
+
+
+def legacy_key(event) -> tuple:
+    """Returns subject and task of an event whose id was built with hash()."""
+    return event.get("name", "").split(" <", 1)[0], event.get("description")
+
+
+class EventIndex:
+    """The events of a calendar indexed by id."""
+
+    def __init__(self, events):
+        self.events = events
+        self.by_id = {}
+        # Events of older syncs used ids that change with every process
+        self.legacy = {}
+        for event in events:
+            self.by_id[event["id"]] = event
+            if is_legacy(event):
+                self.legacy[legacy_key(event)] = event
+
+    def upsert(self, event) -> str:
+        """Inserts the event or updates the one with the same id. Returns "inserted",
+        "updated" or "skipped" if nothing changed. Notes added in the calendar are kept."""
+        existing = self.by_id.get(event["id"])
+        if existing is None:
+            existing = self.legacy.pop(legacy_key(event), None)
+            if existing is not None:
+                del self.by_id[existing["id"]]
+                self.by_id[event["id"]] = existing
+
+        if existing is None:
+            self.events.append(event)
+            self.by_id[event["id"]] = event
+            return "inserted"
+
+        changes = {
+            key: value
+            for key, value in event.items()
+            if existing.get(key) != value and not (key == "note" and value is None)
+        }
+        if not changes:
+            return "skipped"
+        existing.update(changes)
+        return "updated"
+
+
+def upsert_events(calendar, events) -> dict:
+    """Merges the events into the first calendar of the plugin data and returns how many
+    were inserted, updated and skipped."""
+    index = EventIndex(calendar["calendars"][0]["events"])
+    counts = {"inserted": 0, "updated": 0, "skipped": 0}
+    for event in events:
+        counts[index.upsert(event)] += 1
+    return counts
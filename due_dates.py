@@ -0,0 +1,90 @@
+"""This module resolves the due dates of assignments, which is the next lesson of their subject.
+
+A table mapping (weekday, subject) to the days until the next lesson is built once per schedule,
+so resolving an assignment is a dict lookup. Cancelled lessons are looked up in a second table
+that only holds the start dates whose next lesson is cancelled."""
+
+import datetime
+from exceptions_store import ExceptionsStore
+from lessons import WEEKDAYS
+
+# Like the schedule page, only the following seven days are searched, in the generic week
+# as well as in the real weeks
+MAX_OFFSET = 7
+
+
+class NextLessonTable:
+    """Days from a weekday until the next lesson of a subject, honoring cancellations."""
+
+    def __init__(self, schedule, exceptions=None):
+        if exceptions is None:
+            exceptions = ExceptionsStore(schedule["exceptions"])
+
+        subject_days = {}
+        for day_idx, weekday in enumerate(WEEKDAYS):
+            for lesson in schedule[weekday]:
+                if lesson["subject"] != "NONE":
+                    subject_days.setdefault(lesson["subject"], set()).add(day_idx)
+
+        self.offsets = {
+            (weekday, subject): min((day - weekday - 1) % 7 + 1 for day in days)
+            for subject, days in subject_days.items()
+            for weekday in range(7)
+        }
+
+        cancelled = {
+            (datetime.date.fromisoformat(exception["date"]), exception["subject"])
+            for exception in exceptions.to_list()
+            if exception["cancelled"]
+        }
+        # Start dates whose next lesson is cancelled get the offset of the first lesson
+        # that takes place
+        self.overrides = {}
+        for date, subject in cancelled:
+            for days_before in range(1, 8):
+                start = date - datetime.timedelta(days=days_before)
+                if self.offsets.get((start.weekday(), subject)) != days_before:
+                    continue
+                offset = days_before
+                while (start + datetime.timedelta(days=offset), subject) in cancelled:
+                    following = start + datetime.timedelta(days=offset)
+                    offset += self.offsets[(following.weekday(), subject)]
+                    if offset > MAX_OFFSET:
+                        offset = None
+                        break
+                self.overrides[(start, subject)] = offset
+
+    def offset(self, start, subject) -> int:
+        """Returns the days from the start date until the next lesson of the subject that
+        isn't cancelled or None if there is none."""
+        key = (start, subject)
+        if key in self.overrides:
+            return self.overrides[key]
+        return self.offsets.get((start.weekday(), subject))
+
+    def next_lesson(self, start, subject) -> datetime.datetime:
+        """Returns the start moved to the day of the next lesson of the subject or None."""
+        offset = self.offset(start.date(), subject)
+        if offset is None:
+            return None
+        return start + datetime.timedelta(days=offset)
+
+
+def resolve_due_dates(assignments, schedule, exceptions=None, weeks=None) -> list:
+    """Returns the due date of every assignment. The real schedules in weeks are used if
+    given, the generic week of schedule otherwise."""
+    table = NextLessonTable(schedule, exceptions)
+    due_dates = []
+    for assignment in assignments:
+        start = datetime.datetime.fromtimestamp(assignment["start"])
+        due_date = None
+        if weeks is not None:
+            next_date = weeks.next_lesson_date(
+                assignment["subject"], start.date(), MAX_OFFSET
+            )
+            if next_date is not None:
+                due_date = datetime.datetime.combine(next_date, start.time())
+        if due_date is None:
+            due_date = table.next_lesson(start, assignment["subject"])
+        due_dates.append(due_date)
+    return due_dates
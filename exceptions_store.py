@@ -0,0 +1,104 @@
+"""This module keeps the schedule exceptions (cancelled lessons, room changes, ...) indexed by date.
+
+Exceptions are stored under (date, period, subject) and additionally under (date, subject), so
+lookups don't have to scan the whole list. Exceptions of past days are dropped automatically.
+"""
+
+import datetime
+from lessons import WEEKDAYS
+from schedule_store import write_schedule
+
+
+def migrate_exception(exception, today) -> dict:
+    """Converts an exception of the old format, which only knew the weekday, into one with a
+    date. Like the schedule page, the week of today is used, or the next one on weekends.
+    """
+    if "date" in exception:
+        return exception
+    if today.weekday() > 4:
+        today += datetime.timedelta(days=7)
+    monday = today - datetime.timedelta(days=today.weekday())
+    migrated = dict(exception)
+    migrated["date"] = (
+        monday + datetime.timedelta(days=WEEKDAYS.index(exception["day"]))
+    ).isoformat()
+    migrated.setdefault("period", None)
+    return migrated
+
+
+def migrate_schedule(data, path, today=None) -> dict:
+    """Dates the exceptions of the old format in the schedule data and writes the schedule
+    back to path, so they are only migrated once and expire like all others afterwards.
+    Returns the migrated schedule."""
+    exceptions = data.get("exceptions", [])
+    if all("date" in exception for exception in exceptions):
+        return data
+    today = today or datetime.date.today()
+    data = dict(
+        data,
+        exceptions=[migrate_exception(exception, today) for exception in exceptions],
+    )
+    write_schedule(data, path)
+    return data
+
+
+class ExceptionsStore:
+    """The exceptions of a schedule indexed by date, period and subject."""
+
+    def __init__(self, exceptions=(), today=None, auto_prune=True):
+        self.today = today or datetime.date.today()
+        self.auto_prune = auto_prune
+        self.entries = {}
+        self.by_subject = {}
+        for exception in exceptions:
+            self.add(migrate_exception(exception, self.today))
+        self.prune(self.today)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, exception) -> None:
+        """Adds an exception, replacing one for the same date, period and subject."""
+        key = (exception["date"], exception.get("period"), exception["subject"])
+        if key in self.entries:
+            self.by_subject[(key[0], key[2])].remove(self.entries[key])
+        self.entries[key] = exception
+        self.by_subject.setdefault((key[0], key[2]), []).append(exception)
+
+    def get(self, date, period, subject) -> dict:
+        """Returns the exception for a lesson or None."""
+        return self.entries.get((date.isoformat(), period, subject))
+
+    def for_lesson(self, date, subject) -> list:
+        """Returns all exceptions of a subject on a date."""
+        self._prune_if_new_day()
+        return self.by_subject.get((date.isoformat(), subject), [])
+
+    def is_cancelled(self, date, subject) -> bool:
+        """Returns True if a lesson of the subject is cancelled on that date."""
+        return any(
+            exception["cancelled"] for exception in self.for_lesson(date, subject)
+        )
+
+    def prune(self, today) -> None:
+        """Removes all exceptions before today."""
+        self.today = today
+        today_str = today.isoformat()
+        for key in [key for key in self.entries if key[0] < today_str]:
+            del self.entries[key]
+        for key in [key for key in self.by_subject if key[0] < today_str]:
+            del self.by_subject[key]
+
+    def _prune_if_new_day(self) -> None:
+        if not self.auto_prune:
+            return
+        today = datetime.date.today()
+        if today != self.today:
+            self.prune(today)
+
+    def to_list(self) -> list:
+        """Returns the exceptions in the list format of schedule.json sorted by date."""
+        return [
+            self.entries[key]
+            for key in sorted(self.entries, key=lambda k: (k[0], k[1] or 0, k[2]))
+        ]
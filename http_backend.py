@@ -0,0 +1,194 @@
+"""This module loads the schedule and homework over the schulmanager api without a browser.
+
+The results are shaped like the html_to_json output of the pages the selenium backend scrapes,
+so they can be fed straight into load_schedule_from_json and load_homework_from_json."""
+
+import os
+import threading
+from datetime import date
+from datetime import timedelta
+import requests
+from requests.adapters import HTTPAdapter
+from accounts import get_credentials
+from bell_schedule import get_bell_schedule
+from sync_timing import span
+
+API_URL = "https://login.schulmanager-online.de/api/"
+
+WEEKDAY_NAMES = [
+    "Montag",
+    "Dienstag",
+    "Mittwoch",
+    "Donnerstag",
+    "Freitag",
+    "Samstag",
+    "Sonntag",
+]
+
+# One keep-alive session per username
+sessions = {}
+sessions_lock = threading.Lock()
+
+
+def get_session(account=None) -> requests.Session:
+    """Returns the keep-alive session of an account, logging in on first use. The student
+    the account belongs to is stored as session.student."""
+    username, password = get_credentials(account)
+    with sessions_lock:
+        if username in sessions:
+            return sessions[username]
+
+    new_session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=2)
+    new_session.mount("https://", adapter)
+    new_session.mount("http://", adapter)
+
+    with span("login"):
+        response = new_session.post(
+            os.getenv("SM_API_URL", API_URL) + "login",
+            json={
+                "emailOrUsername": username,
+                "password": password,
+                "hash": None,
+                "mobileApp": False,
+                "institutionId": None,
+            },
+            timeout=10,
+        )
+    response.raise_for_status()
+    login_data = response.json()
+    new_session.headers["Authorization"] = "Bearer " + login_data["jwt"]
+    new_session.student = login_data["user"].get("associatedStudent")
+
+    with sessions_lock:
+        sessions[username] = new_session
+    return new_session
+
+
+def reset_session(account=None) -> None:
+    """Drops the session of an account so the next call logs in again."""
+    username, _ = get_credentials(account)
+    with sessions_lock:
+        session = sessions.pop(username, None)
+    if session is not None:
+        session.close()
+
+
+def call(module_name, endpoint_name, parameters, account=None) -> list:
+    """Calls a single api endpoint for the student of an account and returns its data."""
+
+    def post(session):
+        request_body = {
+            "bundleVersion": os.getenv("SM_BUNDLE_VERSION", "3505280ee7"),
+            "requests": [
+                {
+                    "moduleName": module_name,
+                    "endpointName": endpoint_name,
+                    "parameters": dict(parameters, student=session.student),
+                }
+            ],
+        }
+        return session.post(
+            os.getenv("SM_API_URL", API_URL) + "calls", json=request_body, timeout=10
+        )
+
+    response = post(get_session(account))
+    if response.status_code == 401:
+        # Token expired, log in once more
+        reset_session(account)
+        response = post(get_session(account))
+    response.raise_for_status()
+    return response.json()["results"][0]["data"]
+
+
+def text_node(value) -> dict:
+    """Returns a html_to_json element that only contains text."""
+    return {"_value": value}
+
+
+def lesson_node(lesson) -> dict:
+    """Builds the lesson-cell element for a single lesson of the api."""
+    actual = lesson.get("actualLesson") or {}
+    original = (lesson.get("originalLessons") or [{}])[0]
+    cancelled = lesson.get("isCancelled", False)
+    shown = original if cancelled else actual
+
+    subject = (shown.get("subject") or {}).get("abbreviation", "")
+    teacher = ", ".join(t.get("abbreviation", "") for t in shown.get("teachers", []))
+    room = (shown.get("room") or {}).get("name", "")
+
+    classes = ["lesson"]
+    if cancelled:
+        classes.append("cancelled")
+        subject_node = text_node(subject)
+    else:
+        if lesson.get("isSubstitution", False):
+            classes.append("is-new")
+        subject_node = {"span": [text_node(subject)]}
+
+    return {
+        "_attributes": {"class": classes},
+        "span": [subject_node, {"span": [{"span": [text_node(teacher)]}]}],
+        "div": [{"span": [{"span": [text_node(room)]}]}],
+    }
+
+
+def load_schedule_data(week_start, account=None) -> dict:
+    """Returns the schedule of the week starting at week_start shaped like the calendar-table."""
+    lessons = call(
+        "schedules",
+        "get-actual-lessons",
+        {
+            "start": week_start.isoformat(),
+            "end": (week_start + timedelta(days=4)).isoformat(),
+        },
+        account,
+    )
+
+    periods = len(get_bell_schedule())
+    rows = [{"td": [{} for _ in range(5)]} for _ in range(periods)]
+    for lesson in lessons:
+        day = (date.fromisoformat(lesson["date"]) - week_start).days
+        hour = int(lesson["classHour"]["number"]) - 1
+        if 0 <= day < 5 and 0 <= hour < periods:
+            rows[hour]["td"][day] = {"div": [{"div": [{"div": [lesson_node(lesson)]}]}]}
+
+    return {"tbody": [{"tr": rows}]}
+
+
+def load_homework_data(since, account=None) -> dict:
+    """Returns the homework given since the given date shaped like the homework tiles."""
+    homeworks = call(
+        "classbook",
+        "get-homework",
+        {"start": since.isoformat(), "end": date.today().isoformat()},
+        account,
+    )
+
+    days = {}
+    for homework in homeworks:
+        days.setdefault(homework["date"], []).append(
+            {
+                "h4": [text_node(homework["subject"]["name"])],
+                "p": [{"span": [text_node(homework["homework"])]}],
+            }
+        )
+
+    tiles = []
+    for day in sorted(days, reverse=True):
+        day_date = date.fromisoformat(day)
+        header = (
+            WEEKDAY_NAMES[day_date.weekday()] + ", " + day_date.strftime("%d.%m.%Y")
+        )
+        tiles.append({"div": [text_node(header), {"div": days[day]}]})
+
+    return {"div": tiles}
+
+
+def load_page_data(monday, account=None) -> tuple:
+    """Loads the schedule of the week starting at monday and the recent homework over http."""
+    with span("load_schedule"):
+        schedule_data = load_schedule_data(monday, account)
+    with span("load_homework"):
+        homework_data = load_homework_data(date.today() - timedelta(days=42), account)
+    return schedule_data, homework_data
@@ -0,0 +1,268 @@
+"""This module parses the schulmanager html directly into lesson and assignment records.
+
+Instead of building the full html_to_json tree and walking it afterwards, the parsers only keep
+the text of the elements below the lesson cells and homework tiles they are interested in.
+Elements are addressed the same way html_to_json does it, by tag name and index among the
+siblings with the same tag, so both ways give the same records."""
+
+import sys
+import time
+import tracemalloc
+from abc import ABC, abstractmethod
+from html.parser import HTMLParser
+
+VOID_ELEMENTS = {
+    "area",
+    "base",
+    "br",
+    "col",
+    "embed",
+    "hr",
+    "img",
+    "input",
+    "link",
+    "meta",
+    "param",
+    "source",
+    "track",
+    "wbr",
+}
+
+
+class RecordParser(HTMLParser, ABC):
+    """Base parser that collects the values below anchor elements and turns them into records."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.records = []
+        # Every open element is [tag, path, child counts, texts]
+        self.stack = [[None, (), {}, []]]
+        self.anchor = None
+
+    @abstractmethod
+    def is_anchor(self, path) -> bool:
+        """Returns True if the element at path starts a new record."""
+
+    @abstractmethod
+    def make_records(self, path, classes, values) -> list:
+        """Turns the collected values of an anchor element into records."""
+
+    def handle_starttag(self, tag, attrs):
+        parent = self.stack[-1]
+        index = parent[2].get(tag, 0)
+        parent[2][tag] = index + 1
+        path = parent[1] + (tag, index)
+
+        if self.anchor is None and self.is_anchor(path):
+            classes = []
+            for name, value in attrs:
+                if name == "class" and value:
+                    classes = value.split()
+            self.anchor = (path, classes, {})
+        elif self.anchor is not None and path[: len(self.anchor[0])] == self.anchor[0]:
+            # Remember that the element exists even if it never gets a value
+            self.anchor[2][path[len(self.anchor[0]) :]] = None
+
+        frame = [tag, path, {}, []]
+        if tag in VOID_ELEMENTS:
+            self.close_frame(frame)
+        else:
+            self.stack.append(frame)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_ELEMENTS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        for i in range(len(self.stack) - 1, 0, -1):
+            if self.stack[i][0] == tag:
+                while len(self.stack) > i:
+                    self.close_frame(self.stack.pop())
+                return
+
+    def handle_data(self, data):
+        data = data.strip()
+        if data:
+            self.stack[-1][3].append(data)
+
+    def handle_comment(self, data):
+        self.handle_data(data)
+
+    def close_frame(self, frame):
+        """Stores the value of a closed element and finishes the record of an anchor."""
+        if self.anchor is None:
+            return
+        anchor_path, classes, values = self.anchor
+        path = frame[1]
+        if path == anchor_path:
+            values[()] = frame[3][0] if len(frame[3]) == 1 else None
+            self.records.extend(self.make_records(path, classes, values))
+            self.anchor = None
+        elif path[: len(anchor_path)] == anchor_path:
+            values[path[len(anchor_path) :]] = (
+                frame[3][0] if len(frame[3]) == 1 else None
+            )
+
+    def close(self):
+        super().close()
+        while len(self.stack) > 1:
+            self.close_frame(self.stack.pop())
+
+
+def value(values, *path) -> str:
+    """Returns the text of the element at path, raising a KeyError like the dict lookups would."""
+    text = values.get(path)
+    if text is None:
+        raise KeyError(path)
+    return text
+
+
+class ScheduleParser(RecordParser):
+    """Parses the innerHTML of the calendar-table into lesson records."""
+
+    def is_anchor(self, path) -> bool:
+        return (
+            len(path) == 12
+            and path[0:2] == ("tbody", 0)
+            and path[2] == "tr"
+            and path[4] == "td"
+            and path[6:] == ("div", 0, "div", 0, "div", 0)
+        )
+
+    def make_records(self, path, classes, values) -> list:
+        return [dict(lesson_record(classes, values), hour=path[3], day=path[5])]
+
+
+def lesson_record(classes, values) -> dict:
+    """Builds a lesson record from the values below a lesson cell."""
+    cancelled = "cancelled" in classes
+    is_exception = (
+        "is-new" in classes or cancelled or ("span", 0, "visual-diff", 0) in values
+    )
+    if not is_exception:
+        return {
+            "is_exception": False,
+            "subject": value(values, "span", 0, "span", 0),
+            "room": value(values, "div", 0, "span", 0, "span", 0),
+            "teacher": value(values, "span", 1, "span", 0, "span", 0),
+            "cancelled": False,
+        }
+
+    if "is-new" in classes:
+        if ("span", 0, "span", 0) in values:
+            if value(values, "span", 0, "span", 0) == "Klausur":
+                return {
+                    "is_exception": True,
+                    "subject": "",
+                    "room": "",
+                    "teacher": "",
+                    "cancelled": False,
+                }
+            subject = value(values, "span", 0, "span", 0)
+            room = value(values, "div", 0, "span", 0, "span", 0)
+            teacher = value(values, "span", 1, "span", 0, "span", 0)
+        else:
+            subject = value(values, "div", 0)
+            room = "No room specified"
+            teacher = value(values, "div", 1, "span", 0, "span", 0)
+    elif cancelled:
+        subject = value(values, "span", 0)
+        room = value(values, "div", 0, "span", 0, "span", 0)
+        teacher = value(values, "span", 1, "span", 0, "span", 0)
+    else:
+        subject = value(values, "span", 0, "visual-diff", 0, "span", 0)
+        room = value(values, "div", 0, "span", 0, "span", 1)
+        teacher = value(values, "span", 1, "span", 0, "span", 0)
+
+    return {
+        "is_exception": True,
+        "subject": subject,
+        "room": room,
+        "teacher": teacher,
+        "cancelled": cancelled,
+    }
+
+
+class HomeworkParser(RecordParser):
+    """Parses the innerHTML of the homework column into assignment records."""
+
+    def is_anchor(self, path) -> bool:
+        return len(path) == 2 and path[0] == "div"
+
+    def make_records(self, path, classes, values) -> list:
+        date_str = value(values, "div", 0)
+        records = []
+        index = 0
+        while ("div", 1, "div", index) in values:
+            subject = ""
+            task = ""
+            try:
+                subject = value(values, "div", 1, "div", index, "h4", 0)
+                task = value(values, "div", 1, "div", index, "p", 0, "span", 0)
+            except KeyError:
+                pass
+            records.append({"date": date_str, "subject": subject, "task": task})
+            index += 1
+        return records
+
+
+def parse_schedule(html_content) -> list:
+    """Returns the lesson records of the calendar-table html in document order."""
+    parser = ScheduleParser()
+    parser.feed(html_content)
+    parser.close()
+    return parser.records
+
+
+def parse_homework(html_content) -> list:
+    """Returns the assignment records of the homework html in document order."""
+    parser = HomeworkParser()
+    parser.feed(html_content)
+    parser.close()
+    return parser.records
+
+
+def measure(function, runs) -> dict:
+    """Returns the average runtime in ms and the peak allocation in KB of a function."""
+    start = time.perf_counter()
+    for _ in range(runs):
+        function()
+    elapsed = (time.perf_counter() - start) / runs
+
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {"ms": round(elapsed * 1000, 3), "peak_kb": round(peak / 1024, 1)}
+
+
+def compare(schedule_html, homework_html, runs=20) -> dict:
+    """Checks that both parsing paths give the same records and compares their speed and memory."""
+    import sync_schulmanager as smsync
+
+    def old_path():
+        return (
+            smsync.lessons_from_dict(smsync.convert(schedule_html)),
+            smsync.homework_from_dict(smsync.convert(homework_html)),
+        )
+
+    def new_path():
+        return parse_schedule(schedule_html), parse_homework(homework_html)
+
+    if old_path() != new_path():
+        raise ValueError("The streaming parser does not match the html_to_json path")
+
+    return {
+        "html_to_json": measure(old_path, runs),
+        "streaming": measure(new_path, runs),
+    }
+
+
+if __name__ == "__main__":
+    with open(sys.argv[1], encoding="utf-8") as f:
+        schedule_html = f.read()
+    with open(sys.argv[2], encoding="utf-8") as f:
+        homework_html = f.read()
+    print(compare(schedule_html, homework_html))
@@ -0,0 +1,99 @@
+"""This module holds the compact in-memory representation of a schedule.
+
+Lessons store their times as minutes since midnight and intern their strings, so many schedules
+can be kept in one process and comparisons against the current time don't have to convert
+[hour, minute] lists over and over."""
+
+import sys
+from dataclasses import dataclass
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday"]
+
+
+@dataclass(slots=True)
+class Lesson:
+    """A single (possibly double) lesson with start and end in minutes since midnight."""
+
+    subject: str
+    start: int
+    end: int
+    room: str = ""
+    teacher: str = ""
+    double: bool = False
+    two_week_cycle: str = None
+
+    @property
+    def is_free(self) -> bool:
+        """True for the NONE entries that fill gaps in the day."""
+        return self.subject == "NONE"
+
+    def runs_in_week(self, week) -> bool:
+        """Returns whether the lesson takes place in the given iso calendar week."""
+        if self.two_week_cycle == "even":
+            return week % 2 == 0
+        if self.two_week_cycle == "odd":
+            return week % 2 != 0
+        return True
+
+
+def to_minutes(time) -> int:
+    """Converts [hour, minute] into minutes since midnight."""
+    return time[0] * 60 + time[1]
+
+
+def to_time(minutes) -> list:
+    """Converts minutes since midnight into [hour, minute]."""
+    return [minutes // 60, minutes % 60]
+
+
+def lesson_from_dict(data) -> Lesson:
+    """Converts a lesson of schedule.json into a Lesson."""
+    return Lesson(
+        subject=sys.intern(data["subject"]),
+        start=to_minutes(data["start"]),
+        end=to_minutes(data["end"]),
+        room=sys.intern(data.get("room", "")),
+        teacher=sys.intern(data.get("teacher", "")),
+        double=data.get("double", False),
+        two_week_cycle=data.get("two_week_cycle"),
+    )
+
+
+def lesson_to_dict(lesson) -> dict:
+    """Converts a Lesson back into the shape used in schedule.json."""
+    if lesson.is_free:
+        return {
+            "subject": lesson.subject,
+            "start": to_time(lesson.start),
+            "end": to_time(lesson.end),
+        }
+
+    data = {
+        "subject": lesson.subject,
+        "room": lesson.room,
+        "teacher": lesson.teacher,
+        "double": lesson.double,
+        "start": to_time(lesson.start),
+        "end": to_time(lesson.end),
+    }
+    if lesson.two_week_cycle is not None:
+        data["two_week_cycle"] = lesson.two_week_cycle
+    return data
+
+
+def schedule_from_dict(data) -> dict:
+    """Converts a schedule.json dict into day tables of Lessons. Exceptions are kept as they are."""
+    schedule = {
+        day: tuple(lesson_from_dict(lesson) for lesson in data[day]) for day in WEEKDAYS
+    }
+    schedule["exceptions"] = data.get("exceptions", [])
+    return schedule
+
+
+def schedule_to_dict(schedule) -> dict:
+    """Converts day tables of Lessons back into the shape of schedule.json."""
+    data = {
+        day: [lesson_to_dict(lesson) for lesson in schedule[day]] for day in WEEKDAYS
+    }
+    data["exceptions"] = schedule["exceptions"]
+    return data
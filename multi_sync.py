@@ -0,0 +1,69 @@
+"""This module syncs the schedules of several accounts at the same time.
+
+Every account is synced by a worker of a bounded thread pool and writes to its own output path
+(see accounts.py). A failing account is reported but doesn't stop the others."""
+
+import sys
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+import sync_schulmanager as smsync
+from accounts import load_accounts
+
+
+def sync_account(account, pool=None) -> dict:
+    """Syncs a single account and returns how long it took and whether it failed."""
+    start = time.perf_counter()
+    try:
+        smsync.sync_schedule(pool, account=account)
+        error = None
+    except Exception as e:
+        traceback.print_exc()
+        error = f"{type(e).__name__}: {e}"
+    return {
+        "name": account["name"],
+        "ok": error is None,
+        "seconds": round(time.perf_counter() - start, 3),
+        "error": error,
+    }
+
+
+def sync_accounts(accounts, max_workers=4, pools=None) -> dict:
+    """Syncs all accounts with at most max_workers at once. pools may map account names to
+    a DriverPool logged into that account. Returns the result of every account and the
+    throughput of the whole run."""
+    pools = pools or {}
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(
+            executor.map(
+                lambda account: sync_account(account, pools.get(account["name"])),
+                accounts,
+            )
+        )
+    elapsed = time.perf_counter() - start
+
+    return {
+        "accounts": results,
+        "total": {
+            "accounts": len(results),
+            "failed": sum(not result["ok"] for result in results),
+            "seconds": round(elapsed, 3),
+            # Time the accounts would have taken one after another
+            "sequential_seconds": round(sum(r["seconds"] for r in results), 3),
+            "accounts_per_minute": (
+                round(len(results) / elapsed * 60, 2) if elapsed > 0 else 0
+            ),
+        },
+    }
+
+
+if __name__ == "__main__":
+    report = sync_accounts(
+        load_accounts(sys.argv[1] if len(sys.argv) > 1 else "accounts.json"),
+        max_workers=int(sys.argv[2]) if len(sys.argv) > 2 else 4,
+    )
+    for result in report["accounts"]:
+        status = "ok" if result["ok"] else "failed: " + result["error"]
+        print(f"{result['name']}: {result['seconds']}s {status}")
+    print(report["total"])
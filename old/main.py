@@ -4,119 +4,117 @@ import os
 import time
 import json
 import datetime
+import queue
+import asyncio
 import threading
+import dataclasses
 from dotenv import load_dotenv
-from pypresence import Presence
-import old.sync_from_schulmanager as smsync
+from pypresence import AioPresence
+import sync_schulmanager as smsync
+from session_pool import DriverPool
+from lessons import WEEKDAYS, lesson_from_dict, schedule_from_dict
+from timeline import WeeklyTimeline
+from presence_scheduler import next_transition, sleep_until
+from sync_scheduler import next_sync_delay
+from presence_publisher import PresencePublisher
+from schedule_watcher import watch_schedule, watch_database
+from schedule_db import ScheduleDatabase, use_sqlite
+from exceptions_store import ExceptionsStore, migrate_schedule
 
 
 CLIENT = "CLIENT_ID LOADED FROM ENV FILE"
+SCHEDULE_PATH = "C:/Users/Kaenguruu/Desktop/Projects/Python/SchoolRPC/schedule.json"
+DATABASE_PATH = "C:/Users/Kaenguruu/Desktop/Projects/Python/SchoolRPC/schedule.db"
 
 schedule = None
+schedule_data = None
+timeline = None
+exceptions = None
 rpc = None
+publisher = None
+
+
+def set_schedule(data) -> bool:
+    """Replaces the schedule with the given schedule.json data. Only the days that changed
+    are converted and rebuilt in the timeline. Returns True if anything changed."""
+    global schedule
+    global schedule_data
+    global timeline
+    global exceptions
+
+    if data == schedule_data:
+        return False
+    new_exceptions = exceptions
+    if schedule_data is None or data.get("exceptions") != schedule_data.get(
+        "exceptions"
+    ):
+        new_exceptions = ExceptionsStore(data.get("exceptions", []))
+    if schedule_data is None:
+        new_schedule = schedule_from_dict(data)
+        new_timeline = WeeklyTimeline(new_schedule)
+    else:
+        changed_days = [day for day in WEEKDAYS if data[day] != schedule_data[day]]
+        new_schedule = dict(schedule)
+        for day in changed_days:
+            new_schedule[day] = tuple(lesson_from_dict(lesson) for lesson in data[day])
+        new_schedule["exceptions"] = data.get("exceptions", [])
+        new_timeline = WeeklyTimeline(new_schedule, timeline, changed_days)
+
+    # Swap everything at once so the presence loop never sees a mix of old and new
+    schedule_data, schedule = data, new_schedule
+    timeline, exceptions = new_timeline, new_exceptions
+    return True
+
+
+def on_schedule_file_changed(data) -> None:
+    """Takes over a new version of schedule.json and wakes up the presence loop"""
+    if set_schedule(migrate_schedule(data, SCHEDULE_PATH)):
+        schedule_changed.set()
+
+
+async def wait_for_transition() -> None:
+    """Sleeps until the presence has to change or the schedule changed"""
+    now = datetime.datetime.now()
+    day_end = datetime.datetime.combine(now.date(), datetime.time(19))
+    await sleep_until(next_transition(timeline, now, day_end), schedule_changed)
 
 
 def get_current_lesson() -> dict:
-    """This function returns the current lesson and a boolean indicating if the lesson has changed since the last call"""
-    # Get current time and day
-    current_time = time.localtime()
-    week_day_idx = current_time.tm_wday
-    current_hour = current_time.tm_hour
-    current_minute = current_time.tm_min
+    """This function returns the current lesson or None if there is no lesson right now"""
+    now = datetime.datetime.now()
 
     # Ignoring weekends
-    if week_day_idx < 0 or week_day_idx > 4:
+    if now.weekday() > 4:
         print("This day ain't made for both of us")
         return None
 
-    current_day = list(schedule.keys())[week_day_idx]
-    current_lesson = None
-
-    for lesson in schedule[current_day]:
-        # Checking if the lesson is valid, the two week cycle is only needed because of a sports lesson that is only every second week
-        if lesson["subject"] == "NONE":
-            continue
-        if "two_week_cycle" in lesson:
-            if (
-                lesson["two_week_cycle"] == "even"
-                and datetime.date(
-                    current_time.tm_year, current_time.tm_mon, current_time.tm_mday
-                ).isocalendar()[1]
-                % 2
-                != 0
-            ):
-                print("TWC: Even week, skipping lesson")
-                continue
-            if (
-                lesson["two_week_cycle"] == "odd"
-                and datetime.date(
-                    current_time.tm_year, current_time.tm_mon, current_time.tm_mday
-                ).isocalendar()[1]
-                % 2
-                == 0
-            ):
-                print("TWC: Odd week, skipping lesson")
-                continue
-
-        # Check if lesson is currently ongoing
-        current_time_minutes = current_hour * 60 + current_minute
-        lesson_start_minutes = lesson["start"][0] * 60 + lesson["start"][1]
-        lesson_end_minutes = lesson["end"][0] * 60 + lesson["end"][1]
-        if lesson_start_minutes <= current_time_minutes < lesson_end_minutes:
-            # Check if there is an exception for this lesson
-            current_lesson = lesson
-            return current_lesson
-    return current_lesson
+    return timeline.current_lesson(now)
 
 
 def get_next_lesson() -> dict:
     """This function returns the next lesson that is scheduled in the current day. If no lesson is found, it returns None."""
-    # Get current time and day
-    current_time = time.localtime()
-    week_day_idx = current_time.tm_wday
-    current_hour = current_time.tm_hour
-    current_minute = current_time.tm_min
-    current_time_minutes = current_hour * 60 + current_minute
-
-    for day in list(schedule.keys())[week_day_idx:]:
-        if day == "exceptions":
-            continue
-        for lesson in schedule[day]:
-            if lesson["subject"] != "NONE":
-                if "two_week_cycle" in lesson:
-                    if (
-                        lesson["two_week_cycle"] == "even"
-                        and datetime.date(
-                            current_time.tm_year,
-                            current_time.tm_mon,
-                            current_time.tm_mday,
-                        ).isocalendar()[1]
-                        % 2
-                        != 0
-                    ):
-                        continue
-                    if (
-                        lesson["two_week_cycle"] == "odd"
-                        and datetime.date(
-                            current_time.tm_year,
-                            current_time.tm_mon,
-                            current_time.tm_mday,
-                        ).isocalendar()[1]
-                        % 2
-                        == 0
-                    ):
-                        continue
-                lesson_start_minutes = lesson["start"][0] * 60 + lesson["start"][1]
-                if lesson_start_minutes >= current_time_minutes:
-                    next_lesson = lesson
-                    return next_lesson
-
-
-def connect_to_discord() -> Presence:
+    now = datetime.datetime.now()
+    next_lesson, next_start = timeline.next_lesson(now)
+    if next_lesson is None or next_start.date() != now.date():
+        return None
+    return next_lesson
+
+
+def disconnect_from_discord(rpc) -> None:
+    """Tells Discord the presence is gone and closes the connection. AioPresence.close()
+    can't be used, it also closes the event loop, which is still running here."""
+    try:
+        rpc.send_data(2, {"v": 1, "client_id": rpc.client_id})
+        rpc.sock_writer.close()
+    except Exception as e:
+        print(e)
+
+
+async def connect_to_discord() -> AioPresence:
     """This tries to connect to the Discord client and returns the RPC object if successful. If not, it returns None."""
     try:
-        RPC = Presence(CLIENT, pipe=0)
-        RPC.connect()
+        RPC = AioPresence(CLIENT, pipe=0)
+        await RPC.connect()
 
         return RPC
     except Exception as e:
@@ -124,36 +122,14 @@ def connect_to_discord() -> Presence:
         return None
 
 
-iteration = 0
+schedule_changed = asyncio.Event()
 
 
-def update_rpc() -> None:
-    """Updates the RPC with the current lesson"""
-    global iteration
-    global schedule
-
+async def update_rpc() -> None:
+    """Updates the RPC with the current lesson whenever it changes until the school day is over"""
     while True:
         if time.localtime().tm_hour < 5 or time.localtime().tm_hour > 18:
-            quit(0)
-
-        # Check if schedule has changed every minute
-        if iteration > 4:
-            with open(
-                "C:/Users/Kaenguruu/Desktop/Projects/Python/SchoolRPC/schedule.json",
-                encoding="utf8",
-            ) as f:
-                data = json.load(f)
-                if (
-                    "monday" not in data
-                    or "tuesday" not in data
-                    or "wednesday" not in data
-                    or "thursday" not in data
-                    or "friday" not in data
-                ):
-                    print("schedule.json is not a valid schedule file")
-                else:
-                    schedule = data
-            iteration = 0
+            return
 
         # Get current time and day
         current_time = time.localtime()
@@ -170,9 +146,7 @@ def update_rpc() -> None:
             next_lesson = get_next_lesson()
             if next_lesson:
                 lesson_start_minutes = current_hour * 60 + current_minute
-                lesson_end_minutes = (
-                    next_lesson["start"][0] * 60 + next_lesson["start"][1]
-                )
+                lesson_end_minutes = next_lesson.start
                 next_start_epoch = int(
                     (
                         datetime.datetime.strptime(
@@ -199,7 +173,7 @@ def update_rpc() -> None:
                         + datetime.timedelta(minutes=lesson_end_minutes)
                     ).timestamp()
                 )
-                rpc.update(
+                await publisher.publish(
                     details="Pause",
                     state="  ",
                     start=next_start_epoch,
@@ -219,18 +193,10 @@ def update_rpc() -> None:
                             + str(current_time.tm_mday),
                             "%Y-%m-%d",
                         )
-                        + datetime.timedelta(
-                            minutes=schedule[list(schedule.keys())[week_day_idx]][
-                                len(schedule[list(schedule.keys())[week_day_idx]]) - 1
-                            ]["end"][0]
-                            * 60
-                            + schedule[list(schedule.keys())[week_day_idx]][
-                                len(schedule[list(schedule.keys())[week_day_idx]]) - 1
-                            ]["end"][1]
-                        )
+                        + datetime.timedelta(minutes=schedule[current_day][-1].end)
                     ).timestamp()
                 )
-                rpc.update(
+                await publisher.publish(
                     details="Freizeit",
                     state="  ",
                     start=end_last_lesson,
@@ -238,62 +204,61 @@ def update_rpc() -> None:
                     large_text="Otto-Kühne-Schule Godesberg",
                 )
 
-            time.sleep(15)
+            await wait_for_transition()
             continue
 
-        lesson_start_minutes = (
-            current_lesson["start"][0] * 60 + current_lesson["start"][1]
-        )
-        lesson_end_minutes = current_lesson["end"][0] * 60 + current_lesson["end"][1]
+        lesson_start_minutes = current_lesson.start
+        lesson_end_minutes = current_lesson.end
         current_lesson_changed = False
 
         # Check for unscheduled changes
-        for exception in schedule["exceptions"]:
-            if (
-                exception["day"] == current_day
-                and exception["subject"] == current_lesson["subject"]
-            ):
-                if exception["cancelled"]:
-                    start_epoch = int(
-                        (
-                            datetime.datetime.strptime(
-                                str(current_time.tm_year)
-                                + "-"
-                                + str(current_time.tm_mon)
-                                + "-"
-                                + str(current_time.tm_mday),
-                                "%Y-%m-%d",
-                            )
-                            + datetime.timedelta(minutes=lesson_start_minutes)
-                        ).timestamp()
-                    )
-                    end_epoch = int(
-                        (
-                            datetime.datetime.strptime(
-                                str(current_time.tm_year)
-                                + "-"
-                                + str(current_time.tm_mon)
-                                + "-"
-                                + str(current_time.tm_mday),
-                                "%Y-%m-%d",
-                            )
-                            + datetime.timedelta(minutes=lesson_end_minutes)
-                        ).timestamp()
-                    )
-                    rpc.update(
-                        details="Freistunde",
-                        state="Entfall",
-                        start=start_epoch,
-                        end=end_epoch,
-                        large_image="logo",
-                        large_text="Otto-Kühne-Schule Godesberg",
-                    )
-                    current_lesson_changed = True
-                else:
-                    current_lesson["subject"] = exception["subject"]
-                    current_lesson["room"] = exception["room"]
-                    current_lesson["double"] = exception["double"]
-                    current_lesson["teacher"] = exception["teacher"]
+        for exception in exceptions.for_lesson(
+            datetime.date.today(), current_lesson.subject
+        ):
+            if exception["cancelled"]:
+                start_epoch = int(
+                    (
+                        datetime.datetime.strptime(
+                            str(current_time.tm_year)
+                            + "-"
+                            + str(current_time.tm_mon)
+                            + "-"
+                            + str(current_time.tm_mday),
+                            "%Y-%m-%d",
+                        )
+                        + datetime.timedelta(minutes=lesson_start_minutes)
+                    ).timestamp()
+                )
+                end_epoch = int(
+                    (
+                        datetime.datetime.strptime(
+                            str(current_time.tm_year)
+                            + "-"
+                            + str(current_time.tm_mon)
+                            + "-"
+                            + str(current_time.tm_mday),
+                            "%Y-%m-%d",
+                        )
+                        + datetime.timedelta(minutes=lesson_end_minutes)
+                    ).timestamp()
+                )
+                await publisher.publish(
+                    details="Freistunde",
+                    state="Entfall",
+                    start=start_epoch,
+                    end=end_epoch,
+                    large_image="logo",
+                    large_text="Otto-Kühne-Schule Godesberg",
+                )
+                current_lesson_changed = True
+            else:
+                current_lesson = dataclasses.replace(
+                    current_lesson,
+                    subject=exception["subject"],
+                    room=exception["room"],
+                    double=exception["double"],
+                    teacher=exception["teacher"],
+                )
 
         if not current_lesson_changed:
             start_epoch = int(
@@ -322,9 +287,9 @@ def update_rpc() -> None:
                     + datetime.timedelta(minutes=lesson_end_minutes)
                 ).timestamp()
             )
-            rpc.update(
-                details=current_lesson["subject"],
-                state="in Raum " + current_lesson["room"],
+            await publisher.publish(
+                details=current_lesson.subject,
+                state="in Raum " + current_lesson.room,
                 start=start_epoch,
                 end=end_epoch,
                 large_image="logo",
@@ -332,27 +297,73 @@ def update_rpc() -> None:
                 buttons=[{"label": "Testbutton", "url": "https://cl.gy/XWop"}],
             )
 
-        time.sleep(15)
-        iteration += 1
+        await wait_for_transition()
 
 
-stop_event = threading.Event()
+class SyncWorker:
+    """Runs functions one after another on a single daemon thread. The browsers of the pool
+    must only be used from one thread, and unlike the thread of a ThreadPoolExecutor a
+    daemon thread doesn't make the interpreter wait for a running sync on exit."""
 
+    def __init__(self):
+        self.jobs = queue.Queue()
+        threading.Thread(target=self.work, daemon=True).start()
 
-def update_schedule() -> None:
-    """This function updates the schedule.json file with the current schedule"""
-    while not stop_event.is_set():
-        smsync.sync_schedule()
-        for _ in range(300):
-            if stop_event.is_set():
-                break
-            time.sleep(1)
-
-
-def main() -> None:
+    def work(self) -> None:
+        while True:
+            loop, future, function, args = self.jobs.get()
+            try:
+                result, error = function(*args), None
+            except Exception as e:
+                result, error = None, e
+            try:
+                loop.call_soon_threadsafe(self.resolve, future, result, error)
+            except RuntimeError:
+                # The event loop is closed already
+                pass
+
+    @staticmethod
+    def resolve(future, result, error) -> None:
+        if future.cancelled():
+            return
+        if error is None:
+            future.set_result(result)
+        else:
+            future.set_exception(error)
+
+    def run(self, function, *args) -> asyncio.Future:
+        """Queues a call and returns a future of its result."""
+        future = asyncio.get_running_loop().create_future()
+        self.jobs.put((future.get_loop(), future, function, args))
+        return future
+
+
+async def update_schedule() -> None:
+    """This function updates the schedule.json file with the current schedule, often before lessons and rarely otherwise"""
+    worker = SyncWorker()
+    pool = DriverPool()
+    failures = 0
+    try:
+        while True:
+            try:
+                await worker.run(smsync.sync_schedule, pool)
+                failures = 0
+            except Exception as e:
+                print(e)
+                failures += 1
+            delay = next_sync_delay(datetime.datetime.now(), timeline, failures)
+            print(f"Next sync in {round(delay)} s")
+            await asyncio.sleep(delay)
+    finally:
+        # Quitting the browsers in use as well ends a sync that is still running right away
+        pool.close(running=True)
+
+
+async def main() -> None:
     """Load data and wait for available client"""
     global schedule
     global rpc
+    global publisher
     global CLIENT
 
     if (
@@ -362,53 +373,69 @@ def main() -> None:
         or time.localtime().tm_hour > 18
     ):
         print("This day ain't made for the both of us")
-        time.sleep(4)
+        await asyncio.sleep(4)
         return
 
     # Load data
-    try:
-        with open(
-            "C:/Users/Kaenguruu/Desktop/Projects/Python/SchoolRPC/schedule.json",
-            encoding="utf8",
-        ) as f:
-            data = json.load(f)
-            if (
-                "monday" not in data
-                or "tuesday" not in data
-                or "wednesday" not in data
-                or "thursday" not in data
-                or "friday" not in data
-            ):
-                print("schedule.json is not a valid schedule file")
-                return
-            schedule = data
-
-    except FileNotFoundError:
-        print("Could not find schedule.json")
-        return
-    except json.JSONDecodeError:
-        print("schedule.json is not a valid JSON file")
-        return
+    db = None
+    if use_sqlite():
+        db = ScheduleDatabase(os.getenv("SCHEDULE_DB", DATABASE_PATH))
+        data = db.load_schedule()
+        if data is None:
+            print("The database holds no schedule yet")
+            return
+        set_schedule(data)
+    else:
+        try:
+            with open(SCHEDULE_PATH, encoding="utf8") as f:
+                data = json.load(f)
+                if (
+                    "monday" not in data
+                    or "tuesday" not in data
+                    or "wednesday" not in data
+                    or "thursday" not in data
+                    or "friday" not in data
+                ):
+                    print("schedule.json is not a valid schedule file")
+                    return
+            set_schedule(migrate_schedule(data, SCHEDULE_PATH))
+
+        except FileNotFoundError:
+            print("Could not find schedule.json")
+            return
+        except json.JSONDecodeError:
+            print("schedule.json is not a valid JSON file")
+            return
 
     # Connect to Discord
     load_dotenv()
     CLIENT = os.getenv("CLIENT_ID")
 
-    rpc = connect_to_discord()
+    rpc = await connect_to_discord()
     while rpc is None:
-        time.sleep(15)
-        rpc = connect_to_discord()
+        await asyncio.sleep(15)
+        rpc = await connect_to_discord()
 
     print("Connected to Discord RPC")
-    thread = threading.Thread(target=update_schedule)
-    thread.start()
+    publisher = PresencePublisher(rpc)
+    sync_task = asyncio.create_task(update_schedule())
+    if db is None:
+        watch_task = asyncio.create_task(
+            watch_schedule(SCHEDULE_PATH, on_schedule_file_changed)
+        )
+    else:
+        watch_task = asyncio.create_task(watch_database(db, on_schedule_file_changed))
     try:
-        while True:
-            update_rpc()
-            time.sleep(0.1)
-    except KeyboardInterrupt:
-        stop_event.set()
-        thread.join()
-
-
-main()
+        await update_rpc()
+    finally:
+        sync_task.cancel()
+        watch_task.cancel()
+        publisher.close()
+        print("Presence updates:", publisher.counters)
+        disconnect_from_discord(rpc)
+
+
+try:
+    asyncio.run(main())
+except KeyboardInterrupt:
+    pass
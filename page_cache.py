@@ -0,0 +1,111 @@
+"""This module remembers the parse results of scraped pages so unchanged pages aren't parsed again.
+
+Results are keyed by a digest of the normalized page content, kept per page kind and limited to
+a few entries each. Every account has its own cache folder next to its schedule.json with one
+file per entry, so storing a result only writes that entry and the cache survives restarts.
+"""
+
+import os
+import re
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from schedule_store import atomic_write
+from accounts import AccountRegistry, get_output_path
+
+
+def normalize(content) -> str:
+    """Removes the parts of a page that change between visits without changing its content."""
+    if not isinstance(content, str):
+        # The http backend returns dicts
+        return json.dumps(content, sort_keys=True, ensure_ascii=False)
+    content = content.replace("<!---->", "")
+    # Angular adds generated attributes like _ngcontent-ng-c3580076777=""
+    content = re.sub(r'\s_ng(?:content|host)-[\w-]+(?:="")?', "", content)
+    return re.sub(r">\s+<", "><", content.strip())
+
+
+def digest(content) -> str:
+    """Returns the digest of the normalized content."""
+    return hashlib.sha256(normalize(content).encode("utf-8")).hexdigest()
+
+
+class PageCache:
+    """A small persistent LRU cache of parse results per page kind."""
+
+    def __init__(self, directory="page_cache", max_entries=8):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.entries = {}
+        self.lock = threading.RLock()
+        try:
+            names = os.listdir(directory)
+        except FileNotFoundError:
+            names = []
+        # The least recently used entries come first, like they were added in that order
+        paths = sorted(
+            (os.path.join(directory, name) for name in names if name.endswith(".json")),
+            key=os.path.getmtime,
+        )
+        for path in paths:
+            kind, key = os.path.basename(path)[: -len(".json")].rsplit("-", 1)
+            try:
+                with open(path, encoding="utf-8") as f:
+                    self.entries.setdefault(kind, OrderedDict())[key] = json.load(f)
+            except json.JSONDecodeError:
+                pass
+
+    def entry_path(self, kind, key) -> str:
+        """Returns the path of the file of an entry."""
+        return os.path.join(self.directory, f"{kind}-{key}.json")
+
+    def get(self, kind, content):
+        """Returns the cached result for the content or None."""
+        key = digest(content)
+        with self.lock:
+            results = self.entries.get(kind)
+            if results is None or key not in results:
+                return None
+            results.move_to_end(key)
+            result = results[key]
+        try:
+            # Keeps the order of use for the next start
+            os.utime(self.entry_path(kind, key))
+        except FileNotFoundError:
+            pass
+        return result
+
+    def put(self, kind, content, result) -> None:
+        """Stores the result for the content, writing only its entry and removing the entries
+        that were dropped."""
+        key = digest(content)
+        with self.lock:
+            results = self.entries.setdefault(kind, OrderedDict())
+            results[key] = result
+            dropped = []
+            while len(results) > self.max_entries:
+                dropped.append(results.popitem(last=False)[0])
+        os.makedirs(self.directory, exist_ok=True)
+        atomic_write(self.entry_path(kind, key), json.dumps(result, ensure_ascii=False))
+        for old_key in dropped:
+            try:
+                os.remove(self.entry_path(kind, old_key))
+            except FileNotFoundError:
+                pass
+
+    def parse(self, kind, content, parser):
+        """Returns the cached result for the content or parses and caches it."""
+        result = self.get(kind, content)
+        if result is None:
+            result = parser(content)
+            self.put(kind, content, result)
+        return result
+
+
+@AccountRegistry
+def get_page_cache(account=None) -> PageCache:
+    """Returns the page cache of an account, kept next to its schedule.json."""
+    return PageCache(
+        os.path.join(os.path.dirname(get_output_path(account)), "page_cache")
+    )
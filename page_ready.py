@@ -0,0 +1,89 @@
+"""This module waits for the content of the single page app to be rendered.
+
+Instead of polling with WebDriverWait, a MutationObserver inside the page reports back as soon
+as the watched container exists, holds the required elements and hasn't changed for a short
+quiet period. The budgets can be set with PAGE_READY_TIMEOUT (seconds) and PAGE_READY_QUIET_MS
+in the .env file."""
+
+import os
+from selenium.common.exceptions import TimeoutException
+
+READY_SCRIPT = """
+const [container, required, quietMs, budgetMs, done] = arguments;
+const start = performance.now();
+let observer = null;
+let quietTimer = null;
+let finished = false;
+
+function finish(ready) {
+    if (finished) {
+        return;
+    }
+    finished = true;
+    if (observer) {
+        observer.disconnect();
+    }
+    clearTimeout(quietTimer);
+    clearTimeout(deadline);
+    done({ready: ready, ms: Math.round(performance.now() - start)});
+}
+
+function target() {
+    const element = document.querySelector(container);
+    if (element && (!required || element.querySelector(required))) {
+        return element;
+    }
+    return null;
+}
+
+function settle() {
+    clearTimeout(quietTimer);
+    quietTimer = setTimeout(() => finish(true), quietMs);
+}
+
+let watched = null;
+
+function check(records) {
+    // The app may replace the container, so it is looked up again on every change
+    const element = target();
+    if (!element) {
+        watched = null;
+        clearTimeout(quietTimer);
+    } else if (element !== watched) {
+        watched = element;
+        settle();
+    } else if (records.some((record) => element.contains(record.target))) {
+        settle();
+    }
+}
+
+const deadline = setTimeout(() => finish(false), budgetMs);
+observer = new MutationObserver(check);
+observer.observe(document.documentElement, {
+    childList: true,
+    subtree: true,
+    characterData: true,
+    attributes: true,
+});
+check([]);
+"""
+
+
+def wait_until_ready(driver, container, required=None, timeout=None, quiet_ms=None):
+    """Waits until the element matching the container selector exists, contains an element
+    matching required and stopped changing. A selector list like ".a, #b" waits for either.
+    Returns the milliseconds it took and raises a TimeoutException if the page isn't ready
+    within timeout seconds."""
+    if timeout is None:
+        timeout = float(os.getenv("PAGE_READY_TIMEOUT", "10"))
+    if quiet_ms is None:
+        quiet_ms = int(os.getenv("PAGE_READY_QUIET_MS", "250"))
+
+    driver.set_script_timeout(timeout + 5)
+    result = driver.execute_async_script(
+        READY_SCRIPT, container, required, quiet_ms, int(timeout * 1000)
+    )
+    if not result["ready"]:
+        raise TimeoutException(f"{container} wasn't ready after {result['ms']} ms")
+    print(f"{container} ready after {result['ms']} ms")
+    return result["ms"]
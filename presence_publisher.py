@@ -0,0 +1,83 @@
+"""This module sits in front of pypresence and only sends presence updates that change something."""
+
+import json
+import time
+import asyncio
+import hashlib
+from collections import deque
+
+
+# Discord drops presence updates beyond five per 20 seconds
+MAX_UPDATES = 5
+UPDATE_WINDOW = 20
+
+
+def payload_hash(payload) -> str:
+    """Returns a stable hash of a presence payload."""
+    return hashlib.sha1(
+        json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    ).hexdigest()
+
+
+class PresencePublisher:
+    """Suppresses updates identical to the last one sent and coalesces bursts so the
+    rate limit of the discord client is never exceeded."""
+
+    def __init__(self, rpc, max_updates=MAX_UPDATES, window=UPDATE_WINDOW):
+        self.rpc = rpc
+        self.max_updates = max_updates
+        self.window = window
+        self.sent_at = deque()
+        self.last_hash = None
+        self.pending = None
+        self.timer = None
+        self.lock = asyncio.Lock()
+        self.counters = {"sent": 0, "suppressed": 0, "coalesced": 0}
+
+    async def publish(self, **payload) -> None:
+        """Sends the payload now, later if the rate limit is reached, or not at all if it
+        matches what discord already shows."""
+        async with self.lock:
+            if payload_hash(payload) == self.last_hash:
+                self.counters["suppressed"] += 1
+                if self.pending is not None:
+                    # The latest state is already shown, drop the queued one
+                    self.pending = None
+                    self.counters["coalesced"] += 1
+                return
+            if self.pending is not None:
+                self.counters["coalesced"] += 1
+            self.pending = payload
+            await self._flush()
+
+    async def _flush(self) -> None:
+        now = time.monotonic()
+        while self.sent_at and now - self.sent_at[0] >= self.window:
+            self.sent_at.popleft()
+
+        if len(self.sent_at) >= self.max_updates:
+            if self.timer is None:
+                self.timer = asyncio.get_running_loop().call_later(
+                    self.window - (now - self.sent_at[0]),
+                    lambda: asyncio.ensure_future(self._timer_flush()),
+                )
+            return
+
+        payload, self.pending = self.pending, None
+        await self.rpc.update(**payload)
+        self.last_hash = payload_hash(payload)
+        self.sent_at.append(now)
+        self.counters["sent"] += 1
+
+    async def _timer_flush(self) -> None:
+        async with self.lock:
+            self.timer = None
+            if self.pending is not None:
+                await self._flush()
+
+    def close(self) -> None:
+        """Cancels a pending delayed update."""
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        self.pending = None
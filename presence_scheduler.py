@@ -0,0 +1,31 @@
+"""This module decides when the discord presence has to change next and sleeps until then."""
+
+import asyncio
+import datetime
+
+
+def next_transition(timeline, now, day_end=None) -> datetime.datetime:
+    """Returns the next moment the presence changes: the next lesson start or end,
+    or day_end if that comes first."""
+    boundary = timeline.next_boundary(now)
+    if day_end is not None and (boundary is None or day_end < boundary):
+        return day_end
+    return boundary
+
+
+async def sleep_until(when, interrupt) -> bool:
+    """Sleeps until the given datetime, or until interrupted if it is None.
+    Returns True if the interrupt event was set before."""
+    while True:
+        if when is None:
+            timeout = None
+        else:
+            timeout = (when - datetime.datetime.now()).total_seconds()
+            if timeout <= 0:
+                return False
+        try:
+            await asyncio.wait_for(interrupt.wait(), timeout)
+        except asyncio.TimeoutError:
+            continue
+        interrupt.clear()
+        return True
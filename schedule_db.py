@@ -0,0 +1,332 @@
+"""This module stores schedules, exceptions, assignments and the sync history in one sqlite file.
+
+It is used instead of schedule.json if STORAGE_BACKEND=sqlite is set in the .env file. Every
+synced week is stored separately with a hash of its content, so unchanged weeks aren't written
+again, and readers only query the week they need. export_json writes a week back into the shape
+of schedule.json."""
+
+import os
+import sys
+import json
+import sqlite3
+import datetime
+import threading
+from dotenv import load_dotenv
+from lessons import WEEKDAYS, lesson_from_dict, lesson_to_dict
+from schedule_store import canonical_hash, write_schedule
+from week_cache import WeekCache, week_key, week_start
+from exceptions_store import migrate_exception
+from accounts import AccountRegistry, get_output_path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS weeks (
+    week TEXT PRIMARY KEY,
+    monday TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    updated TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS lessons (
+    week TEXT NOT NULL,
+    day INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    subject TEXT NOT NULL,
+    room TEXT,
+    teacher TEXT,
+    double INTEGER,
+    start INTEGER NOT NULL,
+    end INTEGER NOT NULL,
+    two_week_cycle TEXT,
+    PRIMARY KEY (week, day, position)
+);
+CREATE INDEX IF NOT EXISTS lessons_subject ON lessons (subject, week);
+CREATE TABLE IF NOT EXISTS exceptions (
+    week TEXT NOT NULL,
+    date TEXT NOT NULL,
+    period INTEGER,
+    subject TEXT NOT NULL,
+    cancelled INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS exceptions_lesson ON exceptions (date, subject);
+CREATE INDEX IF NOT EXISTS exceptions_week ON exceptions (week);
+CREATE TABLE IF NOT EXISTS assignments (
+    id TEXT PRIMARY KEY,
+    subject TEXT NOT NULL,
+    task TEXT NOT NULL,
+    start INTEGER NOT NULL,
+    due TEXT
+);
+CREATE INDEX IF NOT EXISTS assignments_subject ON assignments (subject);
+CREATE TABLE IF NOT EXISTS sync_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started TEXT NOT NULL,
+    seconds REAL NOT NULL,
+    week TEXT,
+    changed INTEGER NOT NULL,
+    lessons INTEGER NOT NULL,
+    exceptions INTEGER NOT NULL,
+    assignments INTEGER NOT NULL
+);
+"""
+
+
+def use_sqlite() -> bool:
+    """Returns True if STORAGE_BACKEND selects the sqlite storage."""
+    load_dotenv(".env")
+    return os.getenv("STORAGE_BACKEND", "json") == "sqlite"
+
+
+class ScheduleDatabase:
+    """Weekly schedules, their exceptions, assignments and past syncs in a sqlite file."""
+
+    def __init__(self, path="schedule.db"):
+        self.path = path
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+        self.db.commit()
+
+    def save_schedule(self, schedule, monday) -> bool:
+        """Stores the schedule of the week starting at monday unless the stored one has the
+        same content. Returns True if it was written."""
+        key = week_key(monday)
+        version = canonical_hash(schedule)
+        with self.lock:
+            row = self.db.execute(
+                "SELECT hash FROM weeks WHERE week = ?", (key,)
+            ).fetchone()
+            if row is not None and row[0] == version:
+                return False
+
+            lessons = []
+            for day_idx, day in enumerate(WEEKDAYS):
+                for position, data in enumerate(schedule[day]):
+                    lesson = lesson_from_dict(data)
+                    lessons.append(
+                        (
+                            key,
+                            day_idx,
+                            position,
+                            lesson.subject,
+                            lesson.room,
+                            lesson.teacher,
+                            int(lesson.double),
+                            lesson.start,
+                            lesson.end,
+                            lesson.two_week_cycle,
+                        )
+                    )
+            exceptions = []
+            for exception in schedule["exceptions"]:
+                # Exceptions of the old format only know their weekday
+                dated = migrate_exception(exception, monday)
+                exceptions.append(
+                    (
+                        key,
+                        dated["date"],
+                        dated["period"],
+                        dated["subject"],
+                        int(dated["cancelled"]),
+                        json.dumps(dated, ensure_ascii=False),
+                    )
+                )
+
+            with self.db:
+                self.db.execute("DELETE FROM lessons WHERE week = ?", (key,))
+                self.db.execute("DELETE FROM exceptions WHERE week = ?", (key,))
+                self.db.executemany(
+                    "INSERT INTO lessons VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    lessons,
+                )
+                self.db.executemany(
+                    "INSERT INTO exceptions VALUES (?, ?, ?, ?, ?, ?)", exceptions
+                )
+                self.db.execute(
+                    "INSERT OR REPLACE INTO weeks VALUES (?, ?, ?, ?)",
+                    (
+                        key,
+                        monday.isoformat(),
+                        version,
+                        datetime.datetime.now().isoformat(timespec="seconds"),
+                    ),
+                )
+        return True
+
+    def latest_week(self) -> str:
+        """Returns the key of the week that was synced last or None."""
+        with self.lock:
+            # Prefetched weeks are stored as well, so the sync history decides
+            row = self.db.execute(
+                "SELECT week FROM sync_history ORDER BY id DESC LIMIT 1"
+            ).fetchone()
+            if row is None:
+                row = self.db.execute(
+                    "SELECT week FROM weeks ORDER BY updated DESC, week DESC LIMIT 1"
+                ).fetchone()
+        return None if row is None else row[0]
+
+    def load_schedule(self, day=None) -> dict:
+        """Returns the schedule of the week of a date in the shape of schedule.json, or of
+        the week synced last without a date. Returns None if the week isn't stored."""
+        key = self.latest_week() if day is None else week_key(week_start(day))
+        if key is None:
+            return None
+        with self.lock:
+            stored = self.db.execute("SELECT 1 FROM weeks WHERE week = ?", (key,))
+            if stored.fetchone() is None:
+                return None
+            lessons = self.db.execute(
+                "SELECT day, subject, room, teacher, double, start, end, "
+                "two_week_cycle FROM lessons WHERE week = ? ORDER BY day, position",
+                (key,),
+            ).fetchall()
+            exceptions = self.db.execute(
+                "SELECT data FROM exceptions WHERE week = ? ORDER BY rowid", (key,)
+            ).fetchall()
+
+        schedule = {day: [] for day in WEEKDAYS}
+        for day_idx, subject, room, teacher, double, start, end, cycle in lessons:
+            lesson = lesson_from_dict(
+                {
+                    "subject": subject,
+                    "room": room,
+                    "teacher": teacher,
+                    "double": bool(double),
+                    "start": [start // 60, start % 60],
+                    "end": [end // 60, end % 60],
+                    "two_week_cycle": cycle,
+                }
+            )
+            schedule[WEEKDAYS[day_idx]].append(lesson_to_dict(lesson))
+        schedule["exceptions"] = [json.loads(row[0]) for row in exceptions]
+        return schedule
+
+    def save_assignments(self, events) -> None:
+        """Stores the assignments of calendar events, replacing ones with the same id."""
+        rows = [
+            (
+                event["id"],
+                event["name"].split(" <", 1)[0],
+                event["description"],
+                int(
+                    datetime.datetime(
+                        event["date"]["year"],
+                        event["date"]["month"] + 1,
+                        event["date"]["day"],
+                    ).timestamp()
+                ),
+                datetime.date(
+                    event["end"]["year"], event["end"]["month"] + 1, event["end"]["day"]
+                ).isoformat(),
+            )
+            for event in events
+        ]
+        with self.lock, self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO assignments VALUES (?, ?, ?, ?, ?)", rows
+            )
+
+    def record_sync(
+        self, started, seconds, monday, changed, schedule, assignments
+    ) -> int:
+        """Adds a sync to the history and returns its id."""
+        lessons = sum(
+            lesson["subject"] != "NONE" for day in WEEKDAYS for lesson in schedule[day]
+        )
+        with self.lock, self.db:
+            cursor = self.db.execute(
+                "INSERT INTO sync_history (started, seconds, week, changed, lessons, "
+                "exceptions, assignments) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    started.isoformat(timespec="seconds"),
+                    round(seconds, 3),
+                    week_key(monday),
+                    int(changed),
+                    lessons,
+                    len(schedule["exceptions"]),
+                    assignments,
+                ),
+            )
+        return cursor.lastrowid
+
+    def last_sync(self) -> int:
+        """Returns the id of the latest sync or 0 if there was none."""
+        with self.lock:
+            return self.db.execute(
+                "SELECT IFNULL(MAX(id), 0) FROM sync_history"
+            ).fetchone()[0]
+
+    def history(self, limit=20) -> list:
+        """Returns the latest syncs, newest first."""
+        with self.lock:
+            cursor = self.db.execute(
+                "SELECT * FROM sync_history ORDER BY id DESC LIMIT ?", (limit,)
+            )
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def export_json(self, path="schedule.json", day=None) -> bool:
+        """Writes a stored week to path in the shape of schedule.json. Returns True if the
+        file was written."""
+        schedule = self.load_schedule(day)
+        if schedule is None:
+            return False
+        return write_schedule(schedule, path)
+
+    def close(self) -> None:
+        """Closes the database."""
+        self.db.close()
+
+
+class DatabaseWeekCache(WeekCache):
+    """A WeekCache that keeps the weeks in a ScheduleDatabase instead of schedule_weeks.json.
+    Every lookup queries only the week it needs, old weeks are kept as history."""
+
+    def __init__(self, db, loader=None):
+        self.db = db
+        self.loader = loader
+        self.subject_days = {}
+
+    def save(self) -> None:
+        """Does nothing, every week is written to the database when it is put."""
+
+    def put_week(self, monday, schedule, save=True) -> bool:
+        """Stores the schedule of the week starting at monday. Returns True if it changed."""
+        changed = self.db.save_schedule(schedule, monday)
+        if changed:
+            self.subject_days.pop(week_key(monday), None)
+        return changed
+
+    def get_week(self, day) -> dict:
+        """Returns the schedule of the week of a date, loading it if it isn't stored yet.
+        Returns None if the week is unknown and can't be loaded."""
+        schedule = self.db.load_schedule(day)
+        if schedule is None and self.loader is not None:
+            schedule = self.loader(week_start(day))
+            if schedule is not None:
+                self.put_week(week_start(day), schedule)
+        return schedule
+
+
+@AccountRegistry
+def get_schedule_db(account=None) -> ScheduleDatabase:
+    """Returns the database of an account. It lives next to the schedule.json of the
+    account unless SCHEDULE_DB is set for the account from .env."""
+    path = os.path.join(os.path.dirname(get_output_path(account)), "schedule.db")
+    if account is None:
+        load_dotenv(".env")
+        path = os.getenv("SCHEDULE_DB", path)
+    return ScheduleDatabase(path)
+
+
+if __name__ == "__main__":
+    # python schedule_db.py [database] [schedule.json]
+    database = ScheduleDatabase(sys.argv[1] if len(sys.argv) > 1 else "schedule.db")
+    output = sys.argv[2] if len(sys.argv) > 2 else "schedule.json"
+    if database.latest_week() is None:
+        print("The database holds no schedule yet")
+    elif database.export_json(output):
+        print("Exported to " + output)
+    else:
+        print(output + " is up to date")
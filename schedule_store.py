@@ -0,0 +1,95 @@
+"""This module writes schedule.json atomically and only if its content actually changed.
+
+Next to the schedule a small .version file holds the canonical hash of its content together with
+the mtime and size of the file it belongs to, so readers can check whether they have to reload
+without parsing the schedule."""
+
+import os
+import json
+import hashlib
+import tempfile
+
+# mkstemp creates files only their owner can read. Written files get the permissions open()
+# would give them instead, so e.g. node_exporter can still read sync_metrics.prom.
+UMASK = os.umask(0)
+os.umask(UMASK)
+DEFAULT_MODE = 0o666 & ~UMASK
+
+
+def canonical_hash(schedule) -> str:
+    """Returns a hash of the schedule that doesn't depend on key order or formatting."""
+    return hashlib.sha256(
+        json.dumps(
+            schedule, sort_keys=True, separators=(",", ":"), ensure_ascii=False
+        ).encode("utf-8")
+    ).hexdigest()
+
+
+def version_path(path) -> str:
+    """Returns the path of the version file belonging to a schedule file."""
+    return path + ".version"
+
+
+def file_signature(path) -> str:
+    """Returns the modification time and size of a file as a string."""
+    stat = os.stat(path)
+    return f"{stat.st_mtime_ns} {stat.st_size}"
+
+
+def read_version(path="schedule.json") -> str:
+    """Returns the hash of the schedule currently stored at path or None if unknown."""
+    try:
+        with open(version_path(path), encoding="utf-8") as f:
+            version, _, signature = f.read().strip().partition(" ")
+        if signature == file_signature(path):
+            return version
+    except FileNotFoundError:
+        pass
+
+    # The version file is missing or belongs to an older version of the schedule
+    try:
+        with open(path, encoding="utf-8") as f:
+            return canonical_hash(json.load(f))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def atomic_write(path, content, mode=DEFAULT_MODE) -> None:
+    """Writes content to a temporary file next to path, syncs it to disk and renames it over path.
+    The file gets the permissions in mode, by default those of a newly created file."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+            if hasattr(os, "fchmod"):
+                os.fchmod(f.fileno(), mode)
+        if not hasattr(os, "fchmod"):
+            os.chmod(temp_path, mode)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    if hasattr(os, "O_DIRECTORY"):
+        # Make sure the rename itself survives a crash
+        dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+def write_schedule(schedule, path="schedule.json") -> bool:
+    """Writes the schedule to path unless the stored one has the same content.
+    Returns True if the file was written."""
+    version = canonical_hash(schedule)
+    if version == read_version(path):
+        return False
+
+    atomic_write(path, json.dumps(schedule, indent=4, ensure_ascii=False))
+    atomic_write(version_path(path), version + " " + file_signature(path))
+    return True
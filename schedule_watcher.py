@@ -0,0 +1,102 @@
+"""This module watches schedule.json and hands over every complete, valid new version of it.
+With the sqlite storage the sync history of the database is watched instead."""
+
+import os
+import json
+import asyncio
+
+try:
+    from inotify_simple import INotify, flags
+except ImportError:
+    INotify = None
+
+
+def file_signature(path) -> tuple:
+    """Returns the modification time and size of a file or None if it doesn't exist."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def read_schedule(path) -> tuple:
+    """Reads and validates a schedule file. Returns its signature and data, or None for
+    the data if the file is missing, invalid or was changed while reading."""
+    signature = file_signature(path)
+    try:
+        with open(path, encoding="utf8") as f:
+            data = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError, UnicodeDecodeError):
+        return signature, None
+    if file_signature(path) != signature:
+        # Still being written, wait for the next change
+        return signature, None
+    if not isinstance(data, dict) or any(
+        day not in data or not isinstance(data[day], list)
+        for day in ["monday", "tuesday", "wednesday", "thursday", "friday"]
+    ):
+        print("schedule.json is not a valid schedule file")
+        return signature, None
+    return signature, data
+
+
+async def wait_for_inotify(inotify, name) -> None:
+    """Waits until inotify reports a finished write or a rename onto the watched file."""
+    loop = asyncio.get_running_loop()
+    while True:
+        readable = loop.create_future()
+        loop.add_reader(inotify.fileno(), readable.set_result, None)
+        try:
+            await readable
+        finally:
+            loop.remove_reader(inotify.fileno())
+        if any(event.name == name for event in inotify.read(timeout=0)):
+            return
+
+
+async def watch_schedule(path, on_change, poll_interval=2) -> None:
+    """Calls on_change with the data of the schedule file whenever it changed to a valid
+    schedule. Uses inotify if available and polls mtime and size otherwise."""
+    last_signature = file_signature(path)
+    inotify = None
+    if INotify is not None:
+        inotify = INotify()
+        directory = os.path.dirname(os.path.abspath(path))
+        inotify.add_watch(directory, flags.CLOSE_WRITE | flags.MOVED_TO | flags.CREATE)
+
+    try:
+        while True:
+            if inotify is not None:
+                await wait_for_inotify(inotify, os.path.basename(path))
+            else:
+                await asyncio.sleep(poll_interval)
+                if file_signature(path) == last_signature:
+                    continue
+
+            signature, data = read_schedule(path)
+            if data is None or signature == last_signature:
+                continue
+            last_signature = signature
+            on_change(data)
+    finally:
+        if inotify is not None:
+            inotify.close()
+
+
+async def watch_database(db, on_change, poll_interval=2) -> None:
+    """Calls on_change with the schedule synced last whenever a sync finished that changed
+    it. Only the id of the latest sync is queried while nothing happens."""
+    last_sync = db.last_sync()
+    last_data = db.load_schedule()
+    while True:
+        await asyncio.sleep(poll_interval)
+        sync = db.last_sync()
+        if sync == last_sync:
+            continue
+        last_sync = sync
+        data = db.load_schedule()
+        if data is None or data == last_data:
+            continue
+        last_data = data
+        on_change(data)
@@ -0,0 +1,212 @@
+"""This module keeps logged in headless browsers around so a sync doesn't have to boot one every time."""
+
+import threading
+from contextlib import contextmanager
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.firefox.service import Service
+from selenium.webdriver.common.by import By
+from selenium.webdriver.firefox.options import Options
+from selenium.webdriver.common.keys import Keys
+from webdriver_manager.firefox import GeckoDriverManager
+from accounts import get_credentials
+from page_ready import wait_until_ready
+from sync_timing import span
+from browser_session import restore_session, save_session, forget_session
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+SCHEDULE_URL = "https://login.schulmanager-online.de/#/modules/schedules/view//"
+
+
+# Only the markup is scraped, so images, fonts, styles and media are never loaded
+LEAN_PREFERENCES = {
+    "permissions.default.image": 2,
+    "permissions.default.stylesheet": 2,
+    "gfx.downloadable_fonts.enabled": False,
+    "browser.display.use_document_fonts": 0,
+    "media.autoplay.default": 5,
+    "media.hardware-video-decoding.enabled": False,
+    "network.prefetch-next": False,
+    "network.dns.disablePrefetch": True,
+    "network.http.speculative-parallel-limit": 0,
+    "browser.cache.disk.enable": False,
+    "browser.sessionhistory.max_total_viewers": 0,
+}
+
+
+def start_driver(driver_path) -> webdriver.Firefox:
+    """Starts a new headless firefox instance with a profile that skips everything
+    the scraper doesn't need."""
+    webdriver_options = Options()
+    webdriver_options.add_argument("-headless")
+    # Don't wait for every subresource, the pages are checked with wait_until_ready
+    webdriver_options.page_load_strategy = "eager"
+    for name, value in LEAN_PREFERENCES.items():
+        webdriver_options.set_preference(name, value)
+
+    return webdriver.Firefox(service=Service(driver_path), options=webdriver_options)
+
+
+def login(driver, account=None) -> None:
+    """Logs into the schulmanager website with the credentials of an account or the ones
+    from the .env file. A stored session is tried first, see browser_session.py."""
+    username, password = get_credentials(account)
+    with span("login"):
+        with span("restore_session"):
+            restored = restore_session(driver, account)
+        with span("open_page"):
+            driver.get(SCHEDULE_URL)
+
+        if restored:
+            with span("wait_restored"):
+                # Either the schedule or the login form if the session expired
+                wait_until_ready(driver, ".lesson-cell, #emailOrUsername")
+            if len(driver.find_elements(By.ID, "emailOrUsername")) == 0:
+                return
+            # The stored session expired, log in with the form
+            forget_session(account)
+
+        with span("wait_form"):
+            wait_until_ready(driver, "#emailOrUsername")
+        username_field = driver.find_element(By.ID, "emailOrUsername")
+        password_field = driver.find_element(By.ID, "password")
+        username_field.send_keys(username)
+        password_field.send_keys(password)
+
+        password_field.send_keys(Keys.RETURN)
+        with span("wait_lessons"):
+            wait_until_ready(driver, ".calendar-table", ".lesson-cell")
+        save_session(driver, account)
+
+
+def is_healthy(driver) -> bool:
+    """Returns True if the browser still responds and is not sitting on the login form."""
+    try:
+        if driver.execute_script("return document.readyState") is None:
+            return False
+        return len(driver.find_elements(By.ID, "emailOrUsername")) == 0
+    except WebDriverException:
+        return False
+
+
+def get_memory_usage(driver) -> int:
+    """Returns the resident memory of the browser in MB or 0 if it can't be determined."""
+    pid = driver.capabilities.get("moz:processID")
+    if psutil is None or pid is None:
+        return 0
+    try:
+        process = psutil.Process(pid)
+        rss = process.memory_info().rss
+        for child in process.children(recursive=True):
+            rss += child.memory_info().rss
+    except psutil.Error:
+        return 0
+    return rss // (1024 * 1024)
+
+
+class DriverPool:
+    """A pool of warm, logged in browsers that are recycled after max_uses syncs or
+    once they grow beyond max_memory_mb. All browsers of a pool are logged into the same
+    account."""
+
+    def __init__(self, size=1, max_uses=50, max_memory_mb=800, account=None):
+        self.size = size
+        self.account = account
+        self.max_uses = max_uses
+        self.max_memory_mb = max_memory_mb
+        self.driver_path = None
+        self.idle = []
+        self.uses = {}
+        self.lock = threading.Lock()
+        self.available = threading.Semaphore(size)
+
+    def _new_driver(self) -> webdriver.Firefox:
+        if self.driver_path is None:
+            with span("driver_install"):
+                self.driver_path = GeckoDriverManager().install()
+        with span("browser_start"):
+            driver = start_driver(self.driver_path)
+        try:
+            login(driver, self.account)
+        except BaseException:
+            # Don't leave a browser behind for every failed login
+            self._retire(driver)
+            raise
+        self.uses[driver] = 0
+        return driver
+
+    def _retire(self, driver) -> None:
+        self.uses.pop(driver, None)
+        try:
+            driver.quit()
+        except WebDriverException:
+            pass
+
+    def _needs_recycling(self, driver) -> bool:
+        if self.uses.get(driver, 0) >= self.max_uses:
+            return True
+        return 0 < self.max_memory_mb < get_memory_usage(driver)
+
+    def acquire(self) -> webdriver.Firefox:
+        """Returns a logged in browser, starting or replacing one if necessary."""
+        with span("wait_for_driver"):
+            self.available.acquire()
+        with self.lock:
+            driver = self.idle.pop() if self.idle else None
+        try:
+            if driver is not None and self._needs_recycling(driver):
+                self._retire(driver)
+                driver = None
+            if driver is not None:
+                with span("health_check"):
+                    healthy = is_healthy(driver)
+                if not healthy:
+                    try:
+                        login(driver, self.account)
+                    except WebDriverException:
+                        self._retire(driver)
+                        driver = None
+            if driver is None:
+                driver = self._new_driver()
+        except Exception:
+            self.available.release()
+            raise
+        self.uses[driver] += 1
+        return driver
+
+    def release(self, driver, broken=False) -> None:
+        """Hands a browser back to the pool. Broken browsers are shut down instead."""
+        if broken:
+            self._retire(driver)
+        else:
+            with self.lock:
+                self.idle.append(driver)
+        self.available.release()
+
+    @contextmanager
+    def driver(self):
+        """Context manager around acquire and release."""
+        driver = self.acquire()
+        broken = False
+        try:
+            yield driver
+        except WebDriverException:
+            broken = True
+            raise
+        finally:
+            self.release(driver, broken)
+
+    def close(self, running=False) -> None:
+        """Shuts down all idle browsers. With running the browsers that are in use are shut
+        down as well, which makes the syncs using them fail right away."""
+        with self.lock:
+            drivers, self.idle = self.idle, []
+            if running:
+                drivers = list(self.uses)
+        for driver in drivers:
+            self._retire(driver)
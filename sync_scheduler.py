@@ -0,0 +1,101 @@
+"""This module decides when the schedule has to be synced next.
+
+Syncs are dense shortly before a lesson starts and right after the times the substitution plan
+is usually updated, sparse during the rest of the school day and paused at night and on
+weekends. Failed syncs are retried with exponential backoff and jitter. All times can be changed
+in the .env file:
+
+SYNC_DAY_START, SYNC_DAY_END    active hours, e.g. 06:00 and 18:00
+SYNC_CHANGE_TIMES               when the plan usually changes, e.g. 06:30,14:00
+SYNC_DENSE_INTERVAL             seconds between syncs in dense phases
+SYNC_SPARSE_INTERVAL            seconds between syncs otherwise
+"""
+
+import os
+import random
+import datetime
+
+# Minutes before a lesson start and after a plan change that are synced densely
+DENSE_BEFORE_LESSON = 30
+DENSE_AFTER_CHANGE = 20
+MAX_BACKOFF = 30 * 60
+
+
+def parse_time(value) -> datetime.time:
+    """Parses a HH:MM string."""
+    hour, minute = value.strip().split(":")
+    return datetime.time(int(hour), int(minute))
+
+
+def get_settings() -> dict:
+    """Returns the scheduler settings from the environment."""
+    return {
+        "day_start": parse_time(os.getenv("SYNC_DAY_START", "06:00")),
+        "day_end": parse_time(os.getenv("SYNC_DAY_END", "18:00")),
+        "change_times": [
+            parse_time(value)
+            for value in os.getenv("SYNC_CHANGE_TIMES", "06:30,14:00").split(",")
+            if value.strip()
+        ],
+        "dense": int(os.getenv("SYNC_DENSE_INTERVAL", "120")),
+        "sparse": int(os.getenv("SYNC_SPARSE_INTERVAL", "1800")),
+    }
+
+
+def next_school_day_start(now, day_start) -> datetime.datetime:
+    """Returns the start of the active hours of the next weekday after now."""
+    day = now.date()
+    while True:
+        start = datetime.datetime.combine(day, day_start)
+        if day.weekday() < 5 and start > now:
+            return start
+        day += datetime.timedelta(days=1)
+
+
+def dense_windows(timeline, now, settings) -> list:
+    """Returns the (start, end) windows of today that are synced densely."""
+    windows = []
+    for change_time in settings["change_times"]:
+        start = datetime.datetime.combine(now.date(), change_time)
+        windows.append((start, start + datetime.timedelta(minutes=DENSE_AFTER_CHANGE)))
+
+    if timeline is not None:
+        lesson, lesson_start = timeline.next_lesson(now)
+        if lesson is not None and lesson_start.date() == now.date():
+            windows.append(
+                (
+                    lesson_start - datetime.timedelta(minutes=DENSE_BEFORE_LESSON),
+                    lesson_start,
+                )
+            )
+    return windows
+
+
+def backoff(failures, base) -> float:
+    """Returns the delay after the given number of failed syncs in a row: the base
+    interval doubled with every failure, capped and randomized to spread out retries."""
+    delay = min(MAX_BACKOFF, base * 2 ** (failures - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def next_sync_delay(now, timeline=None, failures=0, settings=None) -> float:
+    """Returns the seconds until the next sync should start."""
+    if settings is None:
+        settings = get_settings()
+
+    day_start = datetime.datetime.combine(now.date(), settings["day_start"])
+    day_end = datetime.datetime.combine(now.date(), settings["day_end"])
+    if now.weekday() > 4 or not day_start <= now < day_end:
+        return (next_school_day_start(now, settings["day_start"]) - now).total_seconds()
+
+    if failures > 0:
+        return backoff(failures, settings["dense"])
+
+    delay = settings["sparse"]
+    for start, end in dense_windows(timeline, now, settings):
+        if start <= now < end:
+            return settings["dense"]
+        if now < start:
+            # Wake up when the dense window begins
+            delay = min(delay, (start - now).total_seconds())
+    return min(delay, (day_end - now).total_seconds())
@@ -2,28 +2,32 @@
 
 import os
 import json
-import glob
+import time
+from datetime import date
 from datetime import datetime
 from datetime import timedelta
 import html_to_json
 from dotenv import load_dotenv
-from selenium import webdriver
-from selenium.webdriver.firefox.service import Service
 from selenium.webdriver.common.by import By
-from selenium.webdriver.firefox.options import Options
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.wait import WebDriverWait
-from selenium.webdriver.common.keys import Keys
-from webdriver_manager.firefox import GeckoDriverManager
-
-
-def list_md_files(directory):
-    """Lists all markdown files in a directory."""
-    if not directory.endswith("/"):
-        directory += "/"
-    md_files = glob.glob(os.path.join(directory, "*.md"))
-
-    return md_files
+from session_pool import DriverPool, SCHEDULE_URL
+from page_ready import wait_until_ready
+import http_backend
+import lesson_parser
+from bell_schedule import get_bell_schedule
+from schedule_store import atomic_write, write_schedule
+from page_cache import get_page_cache
+from exceptions_store import ExceptionsStore
+from week_cache import WeekCache
+from accounts import AccountRegistry, get_output_path
+from assignment_index import get_assignment_index, task_digest
+from calendar_events import event_id, upsert_events
+from due_dates import resolve_due_dates
+from schedule_db import DatabaseWeekCache, get_schedule_db, use_sqlite
+from sync_timing import span, trace
+
+CALENDAR_PATH = (
+    "C:/Users/Kaenguruu/Desktop/Schule/.obsidian/plugins/fantasy-calendar/data.json"
+)
 
 
 def convert(html_content) -> dict:
@@ -32,39 +36,27 @@ def convert(html_content) -> dict:
     return dicts
 
 
-def clean_up_schedule(entries) -> list:
+def clean_up_schedule(entries, bells=None) -> list:
     """Combines entries that are double entries into one entry with a start and end time."""
-    time_table = [
-        [[7, 50], [8, 35]],
-        [[8, 35], [9, 20]],
-        [[9, 40], [10, 25]],
-        [[10, 30], [11, 15]],
-        [[11, 35], [12, 20]],
-        [[12, 20], [13, 5]],
-        [[13, 30], [14, 15]],
-        [[14, 20], [15, 5]],
-        [[15, 10], [15, 55]],
-        [[15, 55], [16, 40]],
-        [[16, 40], [17, 25]],
-        [[17, 25], [18, 10]],
-    ]
+    if bells is None:
+        bells = get_bell_schedule()
     combined_entries = []
     i = 0
     while i < len(entries):
         if i + 1 < len(entries):
-            current_entry_index = time_table.index(
-                [entries[i]["start"], entries[i]["end"]]
+            current_entry_index = bells.period_of(
+                entries[i]["start"], entries[i]["end"]
             )
-            next_entry_index = time_table.index(
-                [entries[i + 1]["start"], entries[i + 1]["end"]]
+            next_entry_index = bells.period_of(
+                entries[i + 1]["start"], entries[i + 1]["end"]
             )
 
             lesson_to_append = None
             if next_entry_index - current_entry_index > 1:
                 lesson_to_append = {
                     "subject": "NONE",
-                    "start": time_table[current_entry_index + 1][0],
-                    "end": time_table[current_entry_index + 1][1],
+                    "start": bells.start(current_entry_index + 1),
+                    "end": bells.end(current_entry_index + 1),
                 }
         entry = entries[i]
         if i + 1 < len(entries) and entries[i]["subject"] == entries[i + 1]["subject"]:
@@ -110,49 +102,9 @@ def get_exception_details(entry) -> dict:
     }
 
 
-def load_schedule_from_json(jsondata) -> dict:
-    """Loads a schedule from a json string."""
-    # SO EIN MÜLL DER SOURCE CODE SIEHT AUS WIE NACH NER ATOMBOMBE
-    schedule_raw = json.loads(jsondata)
-    schedule = {
-        "monday": [],
-        "tuesday": [],
-        "wednesday": [],
-        "thursday": [],
-        "friday": [],
-        "exceptions": [],
-    }
-
-    subject_abbrv = {
-        "MU G1": "Musik GK 1",
-        "PH L1": "Physik LK 1",
-        "E5 G3": "Englisch GK 3",
-        "PA G1": "Pädagogik GK 1",
-        "GE G2": "Geschichte GK 2",
-        "M L2": "Mathematik LK 2",
-        "E5 P1": "Englisch PJK 1",
-        "D G4": "Deutsch GK 4",
-        "SP G5": "Sport GK 5",
-        "KR G1": "Religion GK 1",
-        "IF G2": "Informatik GK 2",
-        "SW ZK": "Sozialwissenschaften ZK 2",
-    }
-
-    time_table = [
-        [[7, 50], [8, 35]],
-        [[8, 35], [9, 20]],
-        [[9, 40], [10, 25]],
-        [[10, 30], [11, 15]],
-        [[11, 35], [12, 20]],
-        [[12, 20], [13, 5]],
-        [[13, 30], [14, 15]],
-        [[14, 20], [15, 5]],
-        [[15, 10], [15, 55]],
-        [[15, 55], [16, 40]],
-        [[16, 40], [17, 25]],
-        [[17, 25], [18, 10]],
-    ]
-
+def lessons_from_dict(schedule_raw) -> list:
+    """Returns the lesson records of a converted calendar-table in document order."""
+    lessons = []
     # hours from 1 to 12
     for i, hour in enumerate(schedule_raw["tbody"][0]["tr"]):
         for j, lesson_data in enumerate(hour["td"]):
@@ -172,6 +124,9 @@ def load_schedule_from_json(jsondata) -> dict:
                 "teacher": "",
                 "room": "",
                 "subject": "",
+                "cancelled": False,
+                "hour": i,
+                "day": j,
             }
             if not new_lesson["is_exception"]:
                 new_lesson["teacher"] = lesson["span"][1]["span"][0]["span"][0][
@@ -184,128 +139,214 @@ def load_schedule_from_json(jsondata) -> dict:
                 new_lesson["teacher"] = lesson_data["teacher"]
                 new_lesson["room"] = lesson_data["room"]
                 new_lesson["subject"] = lesson_data["subject"]
-                if lesson_data["cancelled"]:
-                    if lesson_data["subject"] == "":
-                        continue
-                    schedule["exceptions"].append(
-                        {
-                            "subject": lesson_data["subject"],
-                            "room": lesson_data["room"],
-                            "teacher": lesson_data["teacher"],
-                            "day": list(schedule.keys())[j],
-                            "cancelled": True,
-                        }
-                    )
-
-            if new_lesson["subject"] != "":
-                schedule[list(schedule.keys())[j]].append(
-                    {
-                        "subject": (
-                            subject_abbrv[new_lesson["subject"].replace("  ", " ")]
-                            if new_lesson["subject"].replace("  ", " ") in subject_abbrv
-                            else new_lesson["subject"]
-                        ),
-                        "room": new_lesson["room"],
-                        "teacher": new_lesson["teacher"],
-                        "double": False,
-                        "start": time_table[i][0],
-                        "end": time_table[i][1],
-                    }
-                )
+                new_lesson["cancelled"] = lesson_data["cancelled"]
+            lessons.append(new_lesson)
+
+    return lessons
+
+
+def current_week_start() -> date:
+    """Returns the monday of the week shown on the schedule page. On weekends that is next week."""
+    today = date.today()
+    if today.weekday() > 4:
+        today += timedelta(days=7)
+    return today - timedelta(days=today.weekday())
+
+
+def build_schedule(lessons, week_start, bells=None) -> dict:
+    """Builds the schedule from lesson records. Exceptions are dated relative to week_start,
+    the monday of the week the records were scraped from."""
+    if bells is None:
+        bells = get_bell_schedule()
+    # SO EIN MÜLL DER SOURCE CODE SIEHT AUS WIE NACH NER ATOMBOMBE
+    schedule = {
+        "monday": [],
+        "tuesday": [],
+        "wednesday": [],
+        "thursday": [],
+        "friday": [],
+        "exceptions": [],
+    }
+
+    subject_abbrv = {
+        "MU G1": "Musik GK 1",
+        "PH L1": "Physik LK 1",
+        "E5 G3": "Englisch GK 3",
+        "PA G1": "Pädagogik GK 1",
+        "GE G2": "Geschichte GK 2",
+        "M L2": "Mathematik LK 2",
+        "E5 P1": "Englisch PJK 1",
+        "D G4": "Deutsch GK 4",
+        "SP G5": "Sport GK 5",
+        "KR G1": "Religion GK 1",
+        "IF G2": "Informatik GK 2",
+        "SW ZK": "Sozialwissenschaften ZK 2",
+    }
+
+    for lesson in lessons:
+        day = list(schedule.keys())[lesson["day"]]
+        subject = lesson["subject"].replace("  ", " ")
+        subject = subject_abbrv.get(subject, lesson["subject"])
+        if lesson["cancelled"]:
+            if lesson["subject"] == "":
+                continue
+            schedule["exceptions"].append(
+                {
+                    "subject": subject,
+                    "room": lesson["room"],
+                    "teacher": lesson["teacher"],
+                    "day": day,
+                    "date": (week_start + timedelta(days=lesson["day"])).isoformat(),
+                    "period": lesson["hour"],
+                    "cancelled": True,
+                }
+            )
+
+        if lesson["subject"] != "":
+            schedule[day].append(
+                {
+                    "subject": subject,
+                    "room": lesson["room"],
+                    "teacher": lesson["teacher"],
+                    "double": False,
+                    "start": bells.start(lesson["hour"]),
+                    "end": bells.end(lesson["hour"]),
+                }
+            )
 
     for day in schedule:
         if day == "exceptions":
             continue
-        schedule[day] = clean_up_schedule(schedule[day])
+        schedule[day] = clean_up_schedule(schedule[day], bells)
 
     return schedule
 
 
-def clean_up_assignments(assignments, schedule) -> dict:
-    """Cleans up the assignments and adds them to the calendar."""
+def load_schedule(schedule_raw, week_start=None) -> dict:
+    """Loads a schedule from a converted calendar-table of the week starting at week_start,
+    by default the week the schedule page shows."""
+    if week_start is None:
+        week_start = current_week_start()
+    return build_schedule(lessons_from_dict(schedule_raw), week_start)
+
+
+def load_schedule_from_json(jsondata) -> dict:
+    """Loads a schedule from a json string."""
+    return load_schedule(json.loads(jsondata))
+
+
+def get_calendar_path(account=None) -> str:
+    """Returns the path of the fantasy-calendar data the assignments of an account are added
+    to. Accounts keep it next to their schedule.json unless they set "calendar". Without an
+    account CALENDAR_PATH in the .env file or the default location is used."""
+    if account is None:
+        return os.getenv("CALENDAR_PATH", CALENDAR_PATH)
+    return account.get(
+        "calendar", os.path.join(os.path.dirname(get_output_path(account)), "data.json")
+    )
+
+
+def load_calendar(path=None) -> dict:
+    """Loads the data of the fantasy-calendar plugin from path or the calendar of the
+    account from .env."""
+    if path is None:
+        path = get_calendar_path()
+    with open(path, "r", encoding="utf-8") as f:
+        return json.loads(f.read())
+
+
+def clean_up_assignments(
+    assignments, schedule, weeks=None, db=None, account=None, save=False
+) -> dict:
+    """Cleans up the assignments and adds them to the calendar of the account. Assignments
+    that already have a note in the export folder of the account are skipped. With save the
+    calendar is written back if any event was added or changed. The new events are stored
+    in db as well if a ScheduleDatabase is given."""
     events = []
+    exceptions = ExceptionsStore(schedule["exceptions"])
+    calendar_path = get_calendar_path(account)
+    data = load_calendar(calendar_path)
+    categories = {
+        category["name"]: category["id"]
+        for category in reversed(data["calendars"][0]["categories"])
+    }
 
-    existing_assignments = []
-
-    for file in list_md_files("C:/Users/Kaenguruu/Desktop/Schule/export/"):
-        with open(file, "r", encoding="utf-8") as f:
-            data = f.read()
-            if "isAssignment: true" in data:
-                existing_assignments.append({"": ""})
-
-    for assignment in assignments:
-        for event in existing_assignments:
-            if (
-                assignment["task"] == event["description"]
-                and assignment["subject"] == event["name"]
-            ):
-                break
-        else:
-            start_timestamp = datetime.fromtimestamp(assignment["start"])
-            end_timestamp = get_next_lesson_for_assignment(assignment, schedule)
-            if (
-                end_timestamp is None
-                or abs((datetime.now() - start_timestamp).days) >= 42
-            ):
-                continue
-            print(assignment["subject"])
-            new_event = {
-                "name": assignment["subject"]
-                + " <"
-                + datetime.fromtimestamp(assignment["start"]).strftime("%d.%m")
-                + " - "
-                + end_timestamp.strftime("%d.%m")
-                + ">",
-                "description": assignment["task"],
-                "date": {
-                    "day": start_timestamp.day,
-                    "month": start_timestamp.month - 1,
-                    "year": start_timestamp.year,
-                },
-                "id": "ID_task_"
-                + str(hash(assignment["task"] + assignment["subject"])),
-                "note": None,
-                "category": next(
-                    (
-                        d
-                        for d in data["calendars"][0]["categories"]
-                        if d["name"] == assignment["subject"]
-                    ),
-                    {"id": None},
-                )["id"],
-                "formulas": [
-                    {
-                        "type": "interval",
-                        "number": 1,
-                        "timespan": "days",
-                    }
-                ],
-                "end": {
-                    "year": end_timestamp.year,
-                    "month": end_timestamp.month - 1,
-                    "day": end_timestamp.day,
-                },
-            }
-            if any(
-                event["name"] == new_event["name"]
-                and event["description"] == new_event["description"]
-                for event in events
-            ):
-                continue
-            else:
-                events.append(new_event)
-    data["calendars"][0]["events"].extend(events)
+    existing_assignments = get_assignment_index(account).keys()
+    new_assignments = [
+        assignment
+        for assignment in assignments
+        if (assignment["subject"], task_digest(assignment["task"]))
+        not in existing_assignments
+    ]
+    due_dates = resolve_due_dates(new_assignments, schedule, exceptions, weeks)
+
+    for assignment, end_timestamp in zip(new_assignments, due_dates):
+        start_timestamp = datetime.fromtimestamp(assignment["start"])
+        if end_timestamp is None or abs((datetime.now() - start_timestamp).days) >= 42:
+            continue
+        print(assignment["subject"])
+        new_event = {
+            "name": assignment["subject"]
+            + " <"
+            + datetime.fromtimestamp(assignment["start"]).strftime("%d.%m")
+            + " - "
+            + end_timestamp.strftime("%d.%m")
+            + ">",
+            "description": assignment["task"],
+            "date": {
+                "day": start_timestamp.day,
+                "month": start_timestamp.month - 1,
+                "year": start_timestamp.year,
+            },
+            "id": event_id(assignment["subject"], assignment["task"]),
+            "note": None,
+            "category": categories.get(assignment["subject"]),
+            "formulas": [
+                {
+                    "type": "interval",
+                    "number": 1,
+                    "timespan": "days",
+                }
+            ],
+            "end": {
+                "year": end_timestamp.year,
+                "month": end_timestamp.month - 1,
+                "day": end_timestamp.day,
+            },
+        }
+        events.append(new_event)
+    counts = upsert_events(data, events)
+    print(
+        f"Calendar events: {counts['inserted']} inserted, {counts['updated']} updated, "
+        f"{counts['skipped']} unchanged"
+    )
+    if save and (counts["inserted"] or counts["updated"]):
+        atomic_write(calendar_path, json.dumps(data, indent=4, ensure_ascii=False))
+    if db is not None:
+        db.save_assignments(events)
     return data
 
 
-def load_homework_from_json(jsondata, schedule) -> dict:
-    """Loads the homework from a json string."""
-    homework_raw = json.loads(jsondata)
-    # Extract date from the JSON
-    date_str = homework_raw["div"][0]["div"][0]["_value"]
-    date_obj = datetime.strptime(date_str.split(", ")[1], "%d.%m.%Y")
-    timestamp = int(date_obj.timestamp())
+def homework_from_dict(homework_raw) -> list:
+    """Returns the assignment records of converted homework tiles in document order."""
+    records = []
+    for day in homework_raw["div"]:
+        date_str = day["div"][0]["_value"]
+        for assignment in day["div"][1]["div"]:
+            subject = ""
+            task = ""
+            try:
+                subject = assignment["h4"][0]["_value"]
+                task = assignment["p"][0]["span"][0]["_value"]
+            except Exception as e:
+                pass
+            records.append({"date": date_str, "subject": subject, "task": task})
+
+    return records
 
+
+def build_assignments(records) -> list:
+    """Builds the assignments from assignment records."""
     subject_abbrv = {
         "Musik": "Musik GK 1",
         "Physik": "Physik LK 1",
@@ -321,133 +362,214 @@ def load_homework_from_json(jsondata, schedule) -> dict:
         "Sozialwissenschaften": "Sozialwissenschaften ZK 2",
     }
 
-    # Extract assignments
     assignments = []
-    for day in homework_raw["div"]:
-        date_str = day["div"][0]["_value"]
-        date_obj = datetime.strptime(date_str.split(", ")[1], "%d.%m.%Y")
-        timestamp = int(date_obj.timestamp())
-        for assignment in day["div"][1]["div"]:
-            subject = ""
-            task = ""
-            try:
-                subject = assignment["h4"][0]["_value"]
-                task = assignment["p"][0]["span"][0]["_value"]
-            except Exception as e:
-                pass
-            assignments.append(
-                {
-                    "subject": subject_abbrv[subject],
-                    "task": task,
-                    "start": timestamp,
-                    "due": 0,
-                }
-            )
+    for record in records:
+        date_obj = datetime.strptime(record["date"].split(", ")[1], "%d.%m.%Y")
+        assignments.append(
+            {
+                "subject": subject_abbrv[record["subject"]],
+                "task": record["task"],
+                "start": int(date_obj.timestamp()),
+                "due": 0,
+            }
+        )
+
+    return assignments
 
+
+def load_homework(homework_raw, schedule) -> dict:
+    """Loads the homework from converted homework tiles."""
+    assignments = build_assignments(homework_from_dict(homework_raw))
     return clean_up_assignments(assignments, schedule)
 
 
-def get_next_lesson_for_assignment(assignment, schedule) -> datetime:
-    """Returns the next lesson for an assignment."""
-    weekdays = [
-        "monday",
-        "tuesday",
-        "wednesday",
-        "thursday",
-        "friday",
-        "saturday",
-        "sunday",
-    ]
-    while (
-        weekdays[0]
-        != datetime.fromtimestamp(assignment["start"]).strftime("%A").lower()
-    ):
-        weekdays.append(weekdays.pop(0))
-    weekdays.append(weekdays.pop(0))
+def load_homework_from_json(jsondata, schedule) -> dict:
+    """Loads the homework from a json string."""
+    return load_homework(json.loads(jsondata), schedule)
 
-    next_seven_days = []
 
-    for day in weekdays:
-        if day == "saturday" or day == "sunday":
-            continue
-        next_seven_days.append(schedule[day])
-        for lesson in schedule[day]:
-            for exception in schedule["exceptions"]:
-                if (
-                    lesson["subject"] == exception["subject"]
-                    and exception["cancelled"]
-                    and exception["day"] == day
-                ):
-                    continue
-            if lesson["subject"] == assignment["subject"]:
-                idx = weekdays.index(day) + 1
-                return datetime.fromtimestamp(assignment["start"]) + timedelta(days=idx)
-
-    return None
-
-
-def load_page_data() -> str:
-    """Loads the page data from the schulmanager website"""
-    load_dotenv(".env")
-    webdriver_options = Options()
-    webdriver_options.add_argument("-headless")
+def get_next_lesson_for_assignment(
+    assignment, schedule, exceptions=None, weeks=None
+) -> datetime:
+    """Returns the next lesson for an assignment that isn't cancelled. The real schedules in
+    weeks are used if given, the generic week of schedule otherwise. Use resolve_due_dates
+    for many assignments."""
+    return resolve_due_dates([assignment], schedule, exceptions, weeks)[0]
 
-    s = Service(GeckoDriverManager().install())
-    driver = webdriver.Firefox(service=s, options=webdriver_options)
-    driver.get("https://login.schulmanager-online.de/#/modules/schedules/view//")
 
-    WebDriverWait(driver, 10).until(
-        EC.presence_of_element_located((By.ID, "emailOrUsername"))
-    )
-    username_field = driver.find_element(By.ID, "emailOrUsername")
-    password_field = driver.find_element(By.ID, "password")
-    username_field.send_keys(os.getenv("SMUSR"))
-    password_field.send_keys(os.getenv("SMPW"))
-
-    password_field.send_keys(Keys.RETURN)
-    WebDriverWait(driver, 10).until(
-        EC.presence_of_element_located((By.CLASS_NAME, "lesson-cell"))
-    )
-    WebDriverWait(driver, timeout=10).until(
-        EC.presence_of_all_elements_located((By.TAG_NAME, "body"))
-    )
+def load_page_data(driver) -> str:
+    """Loads the page data from the schulmanager website using a logged in driver"""
+    with span("open_schedule"):
+        driver.get(SCHEDULE_URL)
+    with span("wait_lessons"):
+        wait_until_ready(driver, ".calendar-table", ".lesson-cell")
 
-    table = driver.find_element(By.CLASS_NAME, "calendar-table")
-    table_contents = table.get_attribute("innerHTML").replace("<!---->", "")
+    with span("read_schedule"):
+        table = driver.find_element(By.CLASS_NAME, "calendar-table")
+        table_contents = table.get_attribute("innerHTML").replace("<!---->", "")
     lines = [line for line in table_contents.splitlines() if line.strip()]
     table_contents = "\n".join(lines)
 
-    driver.get("https://login.schulmanager-online.de/#/modules/classbook/homework/")
+    with span("open_homework"):
+        driver.get("https://login.schulmanager-online.de/#/modules/classbook/homework/")
 
-    WebDriverWait(driver, 10).until(
-        EC.presence_of_element_located((By.CLASS_NAME, "col-xl-6"))
-    )
-
-    homework = driver.find_element(By.CLASS_NAME, "col-xl-6")
-    homework_contents = homework.get_attribute("innerHTML")
+    with span("wait_homework"):
+        wait_until_ready(driver, ".col-xl-6")
 
-    driver.quit()
+    with span("read_homework"):
+        homework = driver.find_element(By.CLASS_NAME, "col-xl-6")
+        homework_contents = homework.get_attribute("innerHTML")
 
     return table_contents, homework_contents
 
 
-def sync_schedule():
-    """Syncs the schedule from the schulmanager website"""
-    schedule_data, homework_data = load_page_data()
-
-    schedule_json_data = json.dumps(
-        convert(schedule_data), indent=4, ensure_ascii=False
+def fetch_week(monday, account=None) -> dict:
+    """Loads the schedule of the week starting at monday. Only the http backend can load
+    other weeks than the current one, for selenium this returns None."""
+    load_dotenv(".env")
+    if os.getenv("SYNC_BACKEND", "selenium") != "http":
+        return None
+    lessons = lessons_from_dict(http_backend.load_schedule_data(monday, account))
+    return build_schedule(lessons, monday)
+
+
+@AccountRegistry
+def get_week_cache(account=None) -> WeekCache:
+    """Returns the cache of weekly schedules of an account, stored next to its schedule.json
+    or in its database with STORAGE_BACKEND=sqlite."""
+    loader = lambda monday: fetch_week(monday, account)
+    if use_sqlite():
+        return DatabaseWeekCache(get_schedule_db(account), loader)
+    return WeekCache(
+        path=os.path.join(
+            os.path.dirname(get_output_path(account)), "schedule_weeks.json"
+        ),
+        loader=loader,
     )
-    schedule = load_schedule_from_json(schedule_json_data)
 
-    homework_json_data = json.dumps(
-        convert(homework_data), indent=4, ensure_ascii=False
-    )
-    calendar_data = load_homework_from_json(homework_json_data, schedule)
-    print(calendar_data)
 
-    with open("schedule.json", "w", encoding="utf-8") as f:
-        f.write(json.dumps(schedule, indent=4, ensure_ascii=False))
+def prefetch_weeks(weeks, monday, account=None) -> None:
+    """Refreshes the SYNC_PREFETCH_WEEKS weeks after monday in the week cache. Weeks that
+    can't be loaded are skipped, later weeks are loaded when they are needed."""
+    for week in range(1, int(os.getenv("SYNC_PREFETCH_WEEKS", "1")) + 1):
+        upcoming = monday + timedelta(weeks=week)
+        try:
+            schedule = fetch_week(upcoming, account)
+        except Exception as e:
+            print(f"Couldn't prefetch the week of {upcoming}: {e}")
+            continue
+        weeks.put_week(upcoming, schedule)
 
 
-sync_schedule()
+def dump_debug_data(lessons, homework, path="debug_sync.json") -> None:
+    """Writes the scraped lesson and assignment records to debug_sync.json."""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(
+            json.dumps(
+                {"lessons": lessons, "homework": homework}, indent=4, ensure_ascii=False
+            )
+        )
+
+
+def sync_schedule(pool=None, debug_dump=False, account=None):
+    """Syncs the schedule from the schulmanager website. The backend is selected by
+    SYNC_BACKEND in the .env file ("selenium" or "http"). Pass a DriverPool to reuse
+    its browsers, otherwise a single use pool is started and shut down again.
+    Without an account the credentials from .env are used and the result is written to
+    schedule.json, see accounts.py. With STORAGE_BACKEND=sqlite it is stored in the
+    database of the account instead, see schedule_db.py.
+    The scraped records are only written to disk if debug_dump or SYNC_DEBUG_DUMP is set.
+    """
+    load_dotenv(".env")
+    with trace("default" if account is None else account["name"]):
+        started = datetime.now()
+        start = time.perf_counter()
+        cache = get_page_cache(account)
+        # The week shown on the schedule page, all of this sync is dated against it
+        monday = current_week_start()
+        output_path = get_output_path(account)
+        output_dir = os.path.dirname(output_path)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+
+        if os.getenv("SYNC_BACKEND", "selenium") == "http":
+            with span("load_page_data"):
+                schedule_raw, homework_raw = http_backend.load_page_data(
+                    monday, account
+                )
+            with span("parse_schedule"):
+                lessons = cache.parse("schedule", schedule_raw, lessons_from_dict)
+            with span("parse_homework"):
+                homework = cache.parse("homework", homework_raw, homework_from_dict)
+        else:
+            own_pool = pool is None
+            if own_pool:
+                pool = DriverPool(account=account)
+            try:
+                with pool.driver() as driver:
+                    with span("load_page_data"):
+                        schedule_data, homework_data = load_page_data(driver)
+            finally:
+                if own_pool:
+                    with span("close_pool"):
+                        pool.close()
+
+            with span("parse_schedule"):
+                lessons = cache.parse(
+                    "schedule", schedule_data, lesson_parser.parse_schedule
+                )
+            with span("parse_homework"):
+                homework = cache.parse(
+                    "homework", homework_data, lesson_parser.parse_homework
+                )
+
+        if debug_dump or os.getenv("SYNC_DEBUG_DUMP"):
+            dump_debug_data(
+                lessons, homework, os.path.join(output_dir, "debug_sync.json")
+            )
+
+        with span("build_schedule"):
+            schedule = build_schedule(lessons, monday)
+        with span("update_weeks"):
+            weeks = get_week_cache(account)
+            week_changed = weeks.put_week(monday, schedule)
+
+        db = get_schedule_db(account) if use_sqlite() else None
+        # The schedule is written before anything else goes over the network, so it is up
+        # to date even if prefetching or the assignments fail
+        if db is None:
+            with span("write"):
+                changed = write_schedule(schedule, output_path)
+        else:
+            # The week cache stored the week in the database already
+            changed = week_changed
+        if not changed:
+            print((output_path if db is None else db.path) + " is up to date")
+
+        if os.getenv("SYNC_BACKEND", "selenium") == "http":
+            with span("prefetch_weeks"):
+                prefetch_weeks(weeks, monday, account)
+
+        calendar_path = get_calendar_path(account)
+        if os.path.exists(calendar_path):
+            with span("assignments"):
+                clean_up_assignments(
+                    build_assignments(homework), schedule, weeks, db, account, save=True
+                )
+        else:
+            print(calendar_path + " doesn't exist, the assignments are skipped")
+
+        if db is None:
+            return
+        db.record_sync(
+            started,
+            time.perf_counter() - start,
+            monday,
+            changed,
+            schedule,
+            len(homework),
+        )
+
+
+if __name__ == "__main__":
+    sync_schedule()
@@ -0,0 +1,131 @@
+"""This module measures how long the stages of a sync take.
+
+Stages are wrapped in span() blocks. All spans of one sync are collected by trace(), which
+appends them as one json line to sync_timings.jsonl and adds them to histograms that are
+written to sync_metrics.prom in the Prometheus text format, e.g. for the textfile collector of
+node_exporter. The paths can be changed with SYNC_TIMING_LOG and SYNC_METRICS."""
+
+import os
+import json
+import time
+import datetime
+import threading
+from contextlib import contextmanager
+from schedule_store import atomic_write
+
+METRIC = "schulmanager_sync_stage_seconds"
+BUCKETS = [0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+
+# Every thread syncs one account at a time and has its own trace
+current = threading.local()
+# Guards the histograms and the files shared by all threads
+write_lock = threading.Lock()
+histograms = None
+
+
+@contextmanager
+def span(name):
+    """Measures the enclosed block as a stage of the running trace. Nested spans are named
+    after their parents, e.g. sync.load_page_data.wait_lessons. Does nothing outside a trace."""
+    spans = getattr(current, "spans", None)
+    if spans is None:
+        yield
+        return
+
+    current.names.append(name)
+    path = ".".join(current.names)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        spans.append(
+            {
+                "stage": path,
+                "start": round(start - current.start, 4),
+                "seconds": round(time.perf_counter() - start, 4),
+            }
+        )
+        current.names.pop()
+
+
+@contextmanager
+def trace(account="default"):
+    """Collects the spans of one sync and writes them out when the sync is done."""
+    current.spans = []
+    current.names = []
+    current.start = time.perf_counter()
+    started = datetime.datetime.now()
+    ok = False
+    try:
+        with span("sync"):
+            yield
+        ok = True
+    finally:
+        spans = current.spans
+        current.spans = None
+        write_trace(
+            {
+                "started": started.isoformat(timespec="seconds"),
+                "account": account,
+                "ok": ok,
+                "spans": spans,
+            }
+        )
+
+
+def load_histograms(path) -> dict:
+    """Reads the histogram state kept next to the metrics file."""
+    try:
+        with open(path + ".json", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def observe(account, stage, seconds) -> None:
+    """Adds a duration to the histogram of a stage."""
+    histogram = histograms.setdefault(account, {}).setdefault(
+        stage, {"buckets": [0] * len(BUCKETS), "sum": 0, "count": 0}
+    )
+    for i, bound in enumerate(BUCKETS):
+        if seconds <= bound:
+            histogram["buckets"][i] += 1
+    histogram["sum"] += seconds
+    histogram["count"] += 1
+
+
+def render_metrics() -> str:
+    """Returns the histograms in the Prometheus text format."""
+    lines = [
+        f"# HELP {METRIC} Duration of the stages of a schulmanager sync.",
+        f"# TYPE {METRIC} histogram",
+    ]
+    for account, stages in sorted(histograms.items()):
+        for stage, histogram in sorted(stages.items()):
+            labels = f'account="{account}",stage="{stage}"'
+            for bound, count in zip(BUCKETS, histogram["buckets"]):
+                lines.append(f'{METRIC}_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(
+                f'{METRIC}_bucket{{{labels},le="+Inf"}} {histogram["count"]}'
+            )
+            lines.append(f"{METRIC}_sum{{{labels}}} {round(histogram['sum'], 4)}")
+            lines.append(f"{METRIC}_count{{{labels}}} {histogram['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def write_trace(record) -> None:
+    """Appends a finished trace to the json log and updates the metrics file."""
+    global histograms
+
+    log_path = os.getenv("SYNC_TIMING_LOG", "sync_timings.jsonl")
+    metrics_path = os.getenv("SYNC_METRICS", "sync_metrics.prom")
+    with write_lock:
+        with open(log_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+        if histograms is None:
+            histograms = load_histograms(metrics_path)
+        for entry in record["spans"]:
+            observe(record["account"], entry["stage"], entry["seconds"])
+        atomic_write(metrics_path + ".json", json.dumps(histograms))
+        atomic_write(metrics_path, render_metrics())
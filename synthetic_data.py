@@ -0,0 +1,182 @@
+"""This module generates synthetic pages shaped like the schulmanager website for benchmarks.
+
+The calendar-table and the homework column are built with the same element structure the
+parsers in lesson_parser.py and sync_schulmanager.py expect, so every page parses into valid
+lesson and assignment records. A seed makes the pages reproducible."""
+
+import random
+import datetime
+from html import escape
+
+# Schedule abbreviations and the subject names used on the homework tiles
+SUBJECTS = [
+    ("MU G1", "Musik"),
+    ("PH L1", "Physik"),
+    ("E5 G3", "Englisch"),
+    ("PA G1", "Erziehungswissenschaft"),
+    ("GE G2", "Geschichte"),
+    ("M L2", "Mathematik"),
+    ("D G4", "Deutsch"),
+    ("SP G5", "Sport"),
+    ("KR G1", "Katholische Religionslehre"),
+    ("IF G2", "Informatik"),
+    ("E5 P1", "Englisch PJK"),
+    ("SW ZK", "Sozialwissenschaften"),
+]
+TEACHERS = ["hof", "qua", "mey", "sch", "kra", "wol", "bec", "ric"]
+ROOMS = ["A2.18", "A4.04", "B1.02", "B2.11", "C0.07", "Sporthalle", "PC1"]
+WEEKDAY_NAMES = ["Montag", "Dienstag", "Mittwoch", "Donnerstag", "Freitag"]
+
+
+def span(text) -> str:
+    """Returns the text wrapped in a span."""
+    return "<span>" + escape(text) + "</span>"
+
+
+def lesson_cell(rng, subject, room, teacher, exception_density) -> str:
+    """Returns a lesson cell, which is an exception with the given probability."""
+    teacher_html = "<span><span>" + span(teacher) + "</span></span>"
+    kind = "normal"
+    if rng.random() < exception_density:
+        kind = rng.choice(["cancelled", "is-new", "room-change", "exam", "plain-new"])
+
+    if kind == "exam":
+        return (
+            '<div class="lesson-cell is-new">'
+            + "<span>"
+            + span("Klausur")
+            + "</span>"
+            + "<div><span>"
+            + span(room)
+            + "</span></div>"
+            + teacher_html
+            + "</div>"
+        )
+    if kind == "plain-new":
+        # New lessons without a room only show the subject and the teacher
+        return (
+            '<div class="lesson-cell is-new">'
+            + "<div>"
+            + escape(subject)
+            + "</div>"
+            + "<div><span>"
+            + span(teacher)
+            + "</span></div>"
+            + "</div>"
+        )
+    if kind == "cancelled":
+        return (
+            '<div class="lesson-cell cancelled">'
+            + span(subject)
+            + "<div><span>"
+            + span(room)
+            + "</span></div>"
+            + teacher_html
+            + "</div>"
+        )
+    if kind == "room-change":
+        return (
+            '<div class="lesson-cell">'
+            + "<span><visual-diff>"
+            + span(subject)
+            + "</visual-diff></span>"
+            + "<div><span>"
+            + span(rng.choice(ROOMS))
+            + span(room)
+            + "</span></div>"
+            + teacher_html
+            + "</div>"
+        )
+    classes = "lesson-cell is-new" if kind == "is-new" else "lesson-cell"
+    return (
+        f'<div class="{classes}">'
+        + "<span>"
+        + span(subject)
+        + "</span>"
+        + "<div><span>"
+        + span(room)
+        + "</span></div>"
+        + teacher_html
+        + "</div>"
+    )
+
+
+def schedule_html(periods=10, exception_density=0.1, seed=0) -> str:
+    """Returns the innerHTML of a calendar-table with the given number of periods a day.
+    Every day has at least two lessons, most subjects are taught as double lessons."""
+    rng = random.Random(seed)
+    days = []
+    for _ in WEEKDAY_NAMES:
+        cells = [None] * periods
+        period = 0
+        last_period = rng.randint(min(2, periods), periods)
+        while period < last_period:
+            if period > 1 and rng.random() < 0.1:
+                # Free period
+                period += 1
+                continue
+            subject = rng.choice(SUBJECTS)[0]
+            room = rng.choice(ROOMS)
+            teacher = rng.choice(TEACHERS)
+            for _ in range(2 if period + 1 < last_period else 1):
+                cells[period] = (subject, room, teacher)
+                period += 1
+        days.append(cells)
+
+    rows = []
+    for period in range(periods):
+        row = []
+        for cells in days:
+            cell = cells[period]
+            content = ""
+            if cell is not None:
+                content = lesson_cell(rng, *cell, exception_density)
+            row.append("<td><div><div>" + content + "</div></div></td>")
+        rows.append("<tr>" + "".join(row) + "</tr>")
+    return "<tbody>" + "".join(rows) + "</tbody>"
+
+
+def homework_html(count=20, today=None, seed=0) -> str:
+    """Returns the innerHTML of the homework column with count assignments spread over
+    the school days of the last six weeks."""
+    rng = random.Random(seed)
+    today = today or datetime.date.today()
+    school_days = [
+        today - datetime.timedelta(days=offset)
+        for offset in range(1, 42)
+        if (today - datetime.timedelta(days=offset)).weekday() < 5
+    ]
+
+    by_day = {}
+    for i in range(count):
+        day = rng.choice(school_days)
+        subject = rng.choice(SUBJECTS)[1]
+        task = f"Aufgabe {i}: S. {rng.randint(1, 300)}"
+        by_day.setdefault(day, []).append((subject, task))
+
+    tiles = []
+    for day in sorted(by_day, reverse=True):
+        date_str = WEEKDAY_NAMES[day.weekday()] + ", " + day.strftime("%d.%m.%Y")
+        assignments = "".join(
+            "<div><h4>" + escape(subject) + "</h4><p>" + span(task) + "</p></div>"
+            for subject, task in by_day[day]
+        )
+        tiles.append(
+            "<div><div>"
+            + escape(date_str)
+            + "</div><div>"
+            + assignments
+            + "</div></div>"
+        )
+    return "".join(tiles)
+
+
+def generate(weeks=4, periods=10, exception_density=0.1, homework=20, seed=0) -> dict:
+    """Returns the schedule pages of the given number of weeks and one homework page."""
+    return {
+        "schedules": [
+            schedule_html(periods, exception_density, seed + week)
+            for week in range(weeks)
+        ],
+        "homework": homework_html(homework, seed=seed),
+    }
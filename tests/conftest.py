@@ -0,0 +1,141 @@
+"""Fixtures shared by the tests, most importantly a stand-in for the schulmanager api.
+
+The stand-in server answers the login and calls endpoints the http backend uses with the data
+of a single student, so the backend can be tested without network access. Point the backend
+at it through SM_API_URL."""
+
+import os
+import sys
+import json
+import threading
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import http_backend  # noqa: E402
+
+STUDENT = {"id": 4711, "firstname": "Max", "lastname": "Mustermann"}
+ACCOUNT = {"name": "test", "username": "max@example.org", "password": "secret"}
+
+
+def api_lesson(day, hour, subject, room, teacher, **flags) -> dict:
+    """Returns a lesson as get-actual-lessons reports it."""
+    lesson = {"subject": {"abbreviation": subject}, "room": {"name": room}}
+    lesson["teachers"] = [{"abbreviation": teacher}]
+    return dict(
+        {
+            "date": day.isoformat(),
+            "classHour": {"number": str(hour)},
+            "actualLesson": lesson,
+            "originalLessons": [lesson],
+        },
+        **flags,
+    )
+
+
+class StandInApi:
+    """The state of the stand-in server: the data it serves and the requests it got."""
+
+    def __init__(self):
+        self.lessons = []
+        self.homework = []
+        self.logins = 0
+        self.calls = []
+        self.token = None
+
+    def expire_token(self) -> None:
+        """Makes the next call fail with 401 like an expired jwt does."""
+        self.token = None
+
+    def login(self, body) -> tuple:
+        if (body.get("emailOrUsername"), body.get("password")) != (
+            ACCOUNT["username"],
+            ACCOUNT["password"],
+        ):
+            return 401, {"error": "invalid credentials"}
+        self.logins += 1
+        self.token = f"token-{self.logins}"
+        return 200, {"jwt": self.token, "user": {"associatedStudent": STUDENT}}
+
+    def call(self, body, authorization) -> tuple:
+        if self.token is None or authorization != "Bearer " + self.token:
+            return 401, {"error": "unauthorized"}
+        if not body.get("bundleVersion"):
+            return 400, {"error": "bundleVersion missing"}
+
+        results = []
+        for request in body["requests"]:
+            self.calls.append(request)
+            parameters = request["parameters"]
+            if parameters.get("student") != STUDENT:
+                return 400, {"error": "unknown student"}
+            start = date.fromisoformat(parameters["start"])
+            end = date.fromisoformat(parameters["end"])
+            endpoint = (request["moduleName"], request["endpointName"])
+            if endpoint == ("schedules", "get-actual-lessons"):
+                data = self.lessons
+            elif endpoint == ("classbook", "get-homework"):
+                data = self.homework
+            else:
+                return 404, {"error": f"unknown endpoint {endpoint}"}
+            results.append(
+                {
+                    "status": 200,
+                    "data": [
+                        entry
+                        for entry in data
+                        if start <= date.fromisoformat(entry["date"]) <= end
+                    ],
+                }
+            )
+        return 200, {"results": results}
+
+
+def make_handler(api):
+    """Returns a request handler class that answers from api."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if self.path == "/api/login":
+                status, response = api.login(body)
+            elif self.path == "/api/calls":
+                status, response = api.call(body, self.headers.get("Authorization"))
+            else:
+                status, response = 404, {"error": "not found"}
+
+            content = json.dumps(response).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+@pytest.fixture
+def stand_in_api(monkeypatch):
+    """Runs the stand-in server on a free local port and points the http backend at it."""
+    api = StandInApi()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(api))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    # bell_schedule.json is loaded relative to the working directory
+    monkeypatch.chdir(ROOT)
+    monkeypatch.setenv("SM_API_URL", f"http://127.0.0.1:{server.server_port}/api/")
+    http_backend.sessions.clear()
+    try:
+        yield api
+    finally:
+        http_backend.sessions.clear()
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,24 @@
+"""Tests of merging assignment events into the calendar data."""
+
+from calendar_events import EventIndex, event_id
+
+
+def assignment_event(subject, task) -> dict:
+    """Returns the event a sync builds for an assignment."""
+    return {"id": event_id(subject, task), "name": subject, "description": task}
+
+
+def test_only_hash_ids_are_taken_over():
+    events = [
+        {"id": "ID_task_-4711", "name": "Physik LK 1", "description": "Versuch"},
+        # Ids of other plugins can end in digits as well
+        {"id": "ID_note_12345", "name": "Physik LK 1", "description": "Protokoll"},
+        # Events edited by hand don't need a name or description
+        {"id": "ID_task_42"},
+    ]
+    index = EventIndex(events)
+
+    assert index.upsert(assignment_event("Physik LK 1", "Versuch")) == "updated"
+    assert events[0]["id"] == event_id("Physik LK 1", "Versuch")
+    assert index.upsert(assignment_event("Physik LK 1", "Protokoll")) == "inserted"
+    assert events[1]["id"] == "ID_note_12345"
@@ -0,0 +1,114 @@
+"""Tests of the http backend against the stand-in api from conftest.py."""
+
+from datetime import date, datetime, timedelta
+import http_backend
+import sync_schulmanager as smsync
+from conftest import ACCOUNT, api_lesson
+
+MONDAY = date(2026, 10, 12)
+
+
+def test_schedule_feeds_build_schedule(stand_in_api):
+    stand_in_api.lessons = [
+        api_lesson(MONDAY, 1, "M L2", "A2.18", "mey"),
+        api_lesson(MONDAY, 2, "M L2", "A2.18", "mey"),
+        api_lesson(MONDAY + timedelta(days=1), 3, "PH L1", "B1.02", "hof"),
+        api_lesson(
+            MONDAY + timedelta(days=1), 4, "PH L1", "B1.02", "hof", isCancelled=True
+        ),
+        api_lesson(
+            MONDAY + timedelta(days=2), 1, "IF G2", "PC1", "ric", isSubstitution=True
+        ),
+        api_lesson(
+            MONDAY + timedelta(days=2), 2, "IF G2", "PC1", "ric", isSubstitution=True
+        ),
+        # Lessons of other weeks are not part of the schedule
+        api_lesson(MONDAY + timedelta(days=7), 1, "D G4", "C0.07", "sch"),
+    ]
+
+    raw, _ = http_backend.load_page_data(MONDAY, ACCOUNT)
+    schedule = smsync.build_schedule(smsync.lessons_from_dict(raw), MONDAY)
+
+    assert schedule["monday"] == [
+        {
+            "subject": "Mathematik LK 2",
+            "room": "A2.18",
+            "teacher": "mey",
+            "double": True,
+            "start": [7, 50],
+            "end": [9, 20],
+        }
+    ]
+    assert [lesson["subject"] for lesson in schedule["wednesday"]] == [
+        "Informatik GK 2"
+    ]
+    assert schedule["exceptions"] == [
+        {
+            "subject": "Physik LK 1",
+            "room": "B1.02",
+            "teacher": "hof",
+            "day": "tuesday",
+            "date": "2026-10-13",
+            "period": 3,
+            "cancelled": True,
+        }
+    ]
+    assert stand_in_api.calls[0]["parameters"]["start"] == "2026-10-12"
+    assert stand_in_api.calls[0]["parameters"]["end"] == "2026-10-16"
+
+
+def test_homework_feeds_build_assignments(stand_in_api):
+    today = date.today()
+    stand_in_api.homework = [
+        {
+            "date": (today - timedelta(days=1)).isoformat(),
+            "subject": {"name": "Mathematik"},
+            "homework": "S. 42 Nr. 3",
+        },
+        {
+            "date": (today - timedelta(days=3)).isoformat(),
+            "subject": {"name": "Physik"},
+            "homework": "Versuch auswerten",
+        },
+        {
+            "date": (today - timedelta(days=60)).isoformat(),
+            "subject": {"name": "Deutsch"},
+            "homework": "Too old to be loaded",
+        },
+    ]
+
+    raw = http_backend.load_homework_data(today - timedelta(days=42), ACCOUNT)
+    assignments = smsync.build_assignments(smsync.homework_from_dict(raw))
+
+    assert assignments == [
+        {
+            "subject": "Mathematik LK 2",
+            "task": "S. 42 Nr. 3",
+            "start": int(
+                datetime.combine(
+                    today - timedelta(days=1), datetime.min.time()
+                ).timestamp()
+            ),
+            "due": 0,
+        },
+        {
+            "subject": "Physik LK 1",
+            "task": "Versuch auswerten",
+            "start": int(
+                datetime.combine(
+                    today - timedelta(days=3), datetime.min.time()
+                ).timestamp()
+            ),
+            "due": 0,
+        },
+    ]
+
+
+def test_expired_token_logs_in_again(stand_in_api):
+    http_backend.load_schedule_data(MONDAY, ACCOUNT)
+    assert stand_in_api.logins == 1
+
+    stand_in_api.expire_token()
+    http_backend.load_schedule_data(MONDAY, ACCOUNT)
+    assert stand_in_api.logins == 2
+    assert len(stand_in_api.calls) == 2
@@ -0,0 +1,30 @@
+"""Tests that the streaming parsers give the same records as the html_to_json path."""
+
+import pytest
+import lesson_parser
+import synthetic_data
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_streaming_parser_matches_html_to_json(seed):
+    schedule_html = synthetic_data.schedule_html(10, 0.5, seed)
+    homework_html = synthetic_data.homework_html(30, seed=seed)
+
+    # Raises if the records differ
+    lesson_parser.compare(schedule_html, homework_html, runs=1)
+
+
+def test_synthetic_pages_cover_every_exception_kind():
+    pages = [synthetic_data.schedule_html(10, 0.5, seed) for seed in range(5)]
+    records = [
+        record for html in pages for record in lesson_parser.parse_schedule(html)
+    ]
+    exceptions = [record for record in records if record["is_exception"]]
+
+    # Exams are is-new cells that become empty records
+    assert any(record["subject"] == "" for record in exceptions)
+    # is-new cells without spans have no room
+    assert any(record["room"] == "No room specified" for record in exceptions)
+    assert any(record["cancelled"] for record in exceptions)
+    assert any("<visual-diff>" in html for html in pages)
+    assert any('is-new"><span><span>' in html for html in pages)
@@ -0,0 +1,35 @@
+"""Tests of the page cache and its files."""
+
+import os
+import page_cache
+
+
+def test_put_writes_only_its_entry_and_drops_the_oldest(tmp_path):
+    cache = page_cache.PageCache(str(tmp_path / "pages"), max_entries=2)
+    cache.put("schedule", "<p>1</p>", [1])
+    cache.put("homework", "<p>1</p>", ["a"])
+    schedule_file = cache.entry_path("schedule", page_cache.digest("<p>1</p>"))
+    written = os.stat(schedule_file).st_mtime_ns
+
+    cache.put("homework", "<p>2</p>", ["b"])
+    assert os.stat(schedule_file).st_mtime_ns == written
+
+    cache.put("homework", "<p>3</p>", ["c"])
+    assert len(os.listdir(tmp_path / "pages")) == 3
+    assert cache.get("homework", "<p>1</p>") is None
+
+    reloaded = page_cache.PageCache(str(tmp_path / "pages"), max_entries=2)
+    assert reloaded.get("schedule", "<p>1</p>") == [1]
+    assert reloaded.get("homework", "<p>3</p>") == ["c"]
+
+
+def test_accounts_have_their_own_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(page_cache.get_page_cache, "objects", {})
+    first = {"name": "first", "output": str(tmp_path / "first" / "schedule.json")}
+    second = {"name": "second", "output": str(tmp_path / "second" / "schedule.json")}
+
+    page_cache.get_page_cache(first).put("schedule", "<p>1</p>", [1])
+
+    assert page_cache.get_page_cache(first) is page_cache.get_page_cache(first)
+    assert page_cache.get_page_cache(second).get("schedule", "<p>1</p>") is None
+    assert os.listdir(tmp_path / "first" / "page_cache")
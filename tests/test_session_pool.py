@@ -0,0 +1,83 @@
+"""Tests of the browser pool with stand-in browsers instead of firefox."""
+
+import pytest
+from selenium.common.exceptions import TimeoutException
+import session_pool
+
+
+class FakeDriver:
+    """A browser that only remembers whether it was shut down."""
+
+    def __init__(self):
+        self.quit_called = False
+
+    def quit(self):
+        self.quit_called = True
+
+
+def test_failed_login_quits_the_new_browser(monkeypatch):
+    drivers = []
+
+    def start_driver(driver_path):
+        drivers.append(FakeDriver())
+        return drivers[-1]
+
+    def login(driver, account=None):
+        raise TimeoutException("login form didn't load")
+
+    monkeypatch.setattr(session_pool, "start_driver", start_driver)
+    monkeypatch.setattr(session_pool, "login", login)
+    pool = session_pool.DriverPool()
+    pool.driver_path = "geckodriver"
+
+    for _ in range(2):
+        with pytest.raises(TimeoutException):
+            pool.acquire()
+
+    assert [driver.quit_called for driver in drivers] == [True, True]
+    assert pool.uses == {}
+
+
+class FakeField:
+    """An input field that accepts any keys."""
+
+    def send_keys(self, keys):
+        pass
+
+
+class LoginPage(FakeDriver):
+    """A browser showing the schedule or, once the session expired, the login form."""
+
+    def __init__(self, expired):
+        super().__init__()
+        self.expired = expired
+
+    def get(self, url):
+        pass
+
+    def find_elements(self, by, value):
+        return [FakeField()] if self.expired else []
+
+    def find_element(self, by, value):
+        return FakeField()
+
+
+@pytest.mark.parametrize("expired", [False, True])
+def test_login_waits_with_the_observer(monkeypatch, expired):
+    waits = []
+    monkeypatch.setattr(session_pool, "restore_session", lambda driver, account: True)
+    monkeypatch.setattr(session_pool, "forget_session", lambda account: None)
+    monkeypatch.setattr(session_pool, "save_session", lambda driver, account: None)
+    monkeypatch.setattr(
+        session_pool,
+        "wait_until_ready",
+        lambda driver, *selectors: waits.append(selectors),
+    )
+
+    session_pool.login(LoginPage(expired))
+
+    assert waits[0] == (".lesson-cell, #emailOrUsername",)
+    if expired:
+        assert waits[1:] == [("#emailOrUsername",), (".calendar-table", ".lesson-cell")]
+    else:
+        assert waits[1:] == []
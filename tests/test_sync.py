@@ -0,0 +1,125 @@
+"""Tests of a whole sync with the http backend against the stand-in api from conftest.py."""
+
+import json
+from datetime import timedelta
+import pytest
+import page_cache
+import assignment_index
+import schedule_db
+import sync_schulmanager as smsync
+from week_cache import week_key
+from conftest import ACCOUNT, api_lesson
+
+
+@pytest.fixture
+def account(stand_in_api, tmp_path, monkeypatch):
+    """An account whose files all live in tmp_path, with an empty calendar."""
+    monkeypatch.setenv("SYNC_BACKEND", "http")
+    monkeypatch.delenv("STORAGE_BACKEND", raising=False)
+    monkeypatch.setenv("SYNC_TIMING_LOG", str(tmp_path / "sync_timings.jsonl"))
+    monkeypatch.setenv("SYNC_METRICS", str(tmp_path / "sync_metrics.prom"))
+    monkeypatch.setattr(page_cache.get_page_cache, "objects", {})
+    monkeypatch.setattr(smsync.get_week_cache, "objects", {})
+    monkeypatch.setattr(assignment_index.open_assignment_index, "objects", {})
+
+    calendar = {
+        "calendars": [
+            {"events": [], "categories": [{"name": "Physik LK 1", "id": "ID_ph"}]}
+        ]
+    }
+    (tmp_path / "data.json").write_text(json.dumps(calendar), encoding="utf-8")
+    return dict(ACCOUNT, output=str(tmp_path / "schedule.json"))
+
+
+def physics_week(monday) -> list:
+    """Returns a double lesson of physics on every day of the week of monday."""
+    return [
+        api_lesson(monday + timedelta(days=day), hour, "PH L1", "B1.02", "hof")
+        for day in range(5)
+        for hour in (1, 2)
+    ]
+
+
+def test_sync_stores_the_week_it_fetched(stand_in_api, account, tmp_path):
+    monday = smsync.current_week_start()
+    stand_in_api.lessons = physics_week(monday)
+    stand_in_api.lessons[1]["isCancelled"] = True
+
+    smsync.sync_schedule(account=account)
+
+    starts = [call["parameters"]["start"] for call in stand_in_api.calls]
+    assert starts[0] == monday.isoformat()
+    weeks = json.loads((tmp_path / "schedule_weeks.json").read_text(encoding="utf-8"))
+    assert weeks[week_key(monday)]["exceptions"][0]["date"] == monday.isoformat()
+
+
+def test_failed_prefetch_doesnt_block_the_write(
+    stand_in_api, account, tmp_path, monkeypatch, capsys
+):
+    monday = smsync.current_week_start()
+    stand_in_api.lessons = physics_week(monday)
+
+    def fetch_week(monday, account=None):
+        raise ConnectionError("network is down")
+
+    monkeypatch.setattr(smsync, "fetch_week", fetch_week)
+    smsync.sync_schedule(account=account)
+
+    schedule = json.loads((tmp_path / "schedule.json").read_text(encoding="utf-8"))
+    assert schedule["monday"][0]["subject"] == "Physik LK 1"
+    assert "Couldn't prefetch the week of" in capsys.readouterr().out
+
+
+def test_sync_adds_assignments_to_the_calendar_once(
+    stand_in_api, account, tmp_path, capsys
+):
+    monday = smsync.current_week_start()
+    stand_in_api.lessons = physics_week(monday)
+    stand_in_api.homework = [
+        {
+            "date": (monday - timedelta(days=3)).isoformat(),
+            "subject": {"name": "Physik"},
+            "homework": "Versuch auswerten",
+        }
+    ]
+
+    smsync.sync_schedule(account=account)
+    assert "Calendar events: 1 inserted" in capsys.readouterr().out
+    smsync.sync_schedule(account=account)
+    assert "Calendar events: 0 inserted, 0 updated, 1 unchanged" in (
+        capsys.readouterr().out
+    )
+
+    calendar = json.loads((tmp_path / "data.json").read_text(encoding="utf-8"))
+    events = calendar["calendars"][0]["events"]
+    assert len(events) == 1
+    assert events[0]["description"] == "Versuch auswerten"
+    assert events[0]["category"] == "ID_ph"
+    assert events[0]["end"] == {
+        "year": monday.year,
+        "month": monday.month - 1,
+        "day": monday.day,
+    }
+
+
+def test_sqlite_backend_keeps_the_weeks_in_the_database(
+    stand_in_api, account, tmp_path, monkeypatch
+):
+    monkeypatch.setenv("STORAGE_BACKEND", "sqlite")
+    monkeypatch.setattr(schedule_db.get_schedule_db, "objects", {})
+    monday = smsync.current_week_start()
+    next_week = physics_week(monday + timedelta(weeks=1))
+    next_week[0]["isCancelled"] = True
+    stand_in_api.lessons = physics_week(monday) + next_week
+
+    smsync.sync_schedule(account=account)
+    smsync.sync_schedule(account=account)
+
+    assert not (tmp_path / "schedule_weeks.json").exists()
+    db = schedule_db.get_schedule_db(account)
+    assert db.load_schedule(monday)["monday"][0]["subject"] == "Physik LK 1"
+    assert db.load_schedule(monday + timedelta(weeks=1))["exceptions"]
+    # The prefetched week doesn't replace the synced one for readers
+    assert db.load_schedule() == db.load_schedule(monday)
+    assert [sync["changed"] for sync in db.history()] == [0, 1]
+    db.close()
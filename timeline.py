@@ -0,0 +1,109 @@
+"""This module answers "what is on now" and "what is next" with binary searches over a weekly timeline."""
+
+import datetime
+from bisect import bisect_left, bisect_right
+from lessons import WEEKDAYS
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def week_minute(when) -> int:
+    """Returns the minutes since monday 00:00 of the week of a datetime."""
+    return when.weekday() * MINUTES_PER_DAY + when.hour * 60 + when.minute
+
+
+class WeeklyTimeline:
+    """The lessons of a schedule as sorted minute-of-week boundaries.
+
+    Lessons with a two week cycle only run every other week, so there is one timeline for
+    even and one for odd iso calendar weeks."""
+
+    def __init__(self, schedule, previous=None, changed_days=None):
+        # Entries of every day for even and odd weeks, only the changed days are rebuilt
+        # when a previous timeline is given
+        if previous is None:
+            changed_days = WEEKDAYS
+            self.days = ([None] * len(WEEKDAYS), [None] * len(WEEKDAYS))
+        else:
+            self.days = (list(previous.days[0]), list(previous.days[1]))
+
+        for day in changed_days:
+            day_idx = WEEKDAYS.index(day)
+            offset = day_idx * MINUTES_PER_DAY
+            for parity in (0, 1):
+                entries = [
+                    (offset + lesson.start, offset + lesson.end, lesson)
+                    for lesson in schedule[day]
+                    if not lesson.is_free and lesson.runs_in_week(parity)
+                ]
+                entries.sort(key=lambda entry: entry[0])
+                self.days[parity][day_idx] = entries
+
+        # weeks[0] is used for even weeks, weeks[1] for odd weeks
+        self.weeks = []
+        self.boundaries = []
+        for parity in (0, 1):
+            # Days don't overlap, so the day lists are already sorted one after another
+            entries = [entry for day in self.days[parity] for entry in day]
+            self.weeks.append(
+                (
+                    [entry[0] for entry in entries],
+                    [entry[1] for entry in entries],
+                    [entry[2] for entry in entries],
+                )
+            )
+            self.boundaries.append(
+                sorted(
+                    {entry[0] for entry in entries} | {entry[1] for entry in entries}
+                )
+            )
+
+    def _week(self, when) -> tuple:
+        return self.weeks[when.isocalendar()[1] % 2]
+
+    def current_lesson(self, when):
+        """Returns the lesson running at the given datetime or None."""
+        starts, ends, lessons = self._week(when)
+        minute = week_minute(when)
+        i = bisect_right(starts, minute) - 1
+        if i >= 0 and minute < ends[i]:
+            return lessons[i]
+        return None
+
+    def next_lesson(self, when) -> tuple:
+        """Returns the next lesson starting at or after the given datetime and its start.
+        Looks into the following weeks if this week has no lesson left."""
+        monday = datetime.datetime.combine(
+            when.date() - datetime.timedelta(days=when.weekday()), datetime.time()
+        )
+        minute = week_minute(when)
+        # Two weeks cover both parities, a third one would not find anything new
+        for week_offset in range(3):
+            week_start = monday + datetime.timedelta(weeks=week_offset)
+            starts, _, lessons = self._week(week_start)
+            i = bisect_left(starts, minute) if week_offset == 0 else 0
+            if i < len(starts):
+                return lessons[i], week_start + datetime.timedelta(minutes=starts[i])
+        return None, None
+
+    def next_boundary(self, when):
+        """Returns the datetime of the next lesson start or end after the given datetime."""
+        monday = datetime.datetime.combine(
+            when.date() - datetime.timedelta(days=when.weekday()), datetime.time()
+        )
+        minute = week_minute(when)
+        for week_offset in range(3):
+            week_start = monday + datetime.timedelta(weeks=week_offset)
+            boundaries = self.boundaries[week_start.isocalendar()[1] % 2]
+            i = bisect_right(boundaries, minute) if week_offset == 0 else 0
+            if i < len(boundaries):
+                return week_start + datetime.timedelta(minutes=boundaries[i])
+        return None
+
+    def current_lessons(self, times) -> list:
+        """Returns the current lesson for each of the given datetimes."""
+        return [self.current_lesson(when) for when in times]
+
+    def next_lessons(self, times) -> list:
+        """Returns the next lesson and its start for each of the given datetimes."""
+        return [self.next_lesson(when) for when in times]
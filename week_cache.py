@@ -0,0 +1,121 @@
+"""This module keeps the schedules of real calendar weeks instead of one generic week.
+
+Every week is stored under its iso week key (e.g. 2024-W25) in schedule_weeks.json. Weeks that
+aren't cached yet are fetched on first use through a loader function."""
+
+import json
+import datetime
+from bisect import bisect_right
+from schedule_store import atomic_write
+from exceptions_store import ExceptionsStore
+from lessons import WEEKDAYS
+
+
+def week_key(day) -> str:
+    """Returns the iso week key of a date."""
+    year, week, _ = day.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def week_start(day) -> datetime.date:
+    """Returns the monday of the week of a date."""
+    return day - datetime.timedelta(days=day.weekday())
+
+
+class WeekCache:
+    """Schedules keyed by iso week with lazy loading of missing weeks."""
+
+    def __init__(self, path="schedule_weeks.json", loader=None, keep_weeks=7):
+        self.path = path
+        self.loader = loader
+        self.keep_weeks = keep_weeks
+        self.subject_days = {}
+        try:
+            with open(path, encoding="utf-8") as f:
+                self.weeks = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.weeks = {}
+
+    def save(self) -> None:
+        """Writes the cache to disk."""
+        atomic_write(self.path, json.dumps(self.weeks, indent=4, ensure_ascii=False))
+
+    def put_week(self, monday, schedule, save=True) -> bool:
+        """Stores the schedule of the week starting at monday and drops weeks that are too old.
+        Returns True if the stored schedule of the week changed."""
+        key = week_key(monday)
+        changed = self.weeks.get(key) != schedule
+        self.weeks[key] = schedule
+        if changed:
+            self.subject_days.pop(key, None)
+
+        oldest = week_key(
+            week_start(datetime.date.today())
+            - datetime.timedelta(weeks=self.keep_weeks)
+        )
+        old_keys = [k for k in self.weeks if k < oldest]
+        for old_key in old_keys:
+            del self.weeks[old_key]
+            self.subject_days.pop(old_key, None)
+        if save and (changed or old_keys):
+            self.save()
+        return changed
+
+    def get_week(self, day) -> dict:
+        """Returns the schedule of the week of a date, loading it if it isn't cached yet.
+        Returns None if the week is unknown and can't be loaded."""
+        key = week_key(day)
+        if key not in self.weeks and self.loader is not None:
+            schedule = self.loader(week_start(day))
+            if schedule is not None:
+                self.put_week(week_start(day), schedule)
+        return self.weeks.get(key)
+
+    def lessons_on(self, day) -> list:
+        """Returns the lessons on a date."""
+        schedule = self.get_week(day)
+        if schedule is None or day.weekday() > 4:
+            return []
+        return schedule[WEEKDAYS[day.weekday()]]
+
+    def _subject_days(self, day) -> dict:
+        """Returns for every subject the weekdays it takes place on in the week of a date,
+        leaving out cancelled lessons."""
+        key = week_key(day)
+        if key not in self.subject_days:
+            schedule = self.get_week(day)
+            if schedule is None:
+                return None
+            exceptions = ExceptionsStore(
+                schedule.get("exceptions", []), today=week_start(day), auto_prune=False
+            )
+            monday = week_start(day)
+            days = {}
+            for day_idx, weekday in enumerate(WEEKDAYS):
+                date = monday + datetime.timedelta(days=day_idx)
+                for lesson in schedule[weekday]:
+                    if lesson["subject"] == "NONE":
+                        continue
+                    if exceptions.is_cancelled(date, lesson["subject"]):
+                        continue
+                    subject_days = days.setdefault(lesson["subject"], [])
+                    if not subject_days or subject_days[-1] != day_idx:
+                        subject_days.append(day_idx)
+            self.subject_days[key] = days
+        return self.subject_days[key]
+
+    def next_lesson_date(self, subject, after, max_days=28) -> datetime.date:
+        """Returns the date of the next lesson of a subject after the given date that isn't
+        cancelled, or None if there is none in the following max_days days."""
+        last = after + datetime.timedelta(days=max_days)
+        current = week_start(after)
+        while current <= last:
+            days = self._subject_days(current)
+            if days is not None and subject in days:
+                weekdays = days[subject]
+                i = bisect_right(weekdays, after.weekday()) if current <= after else 0
+                if i < len(weekdays):
+                    date = current + datetime.timedelta(days=weekdays[i])
+                    return date if date <= last else None
+            current += datetime.timedelta(weeks=1)
+        return None